@@ -53,15 +53,27 @@ def run_command(
         raise
 
 
+def run_migrations(manage_py: str):
+    run_command(["python", manage_py, "makemigrations", "accounts"])
+    run_command(["python", manage_py, "makemigrations", "employees"])
+    run_command(["python", manage_py, "makemigrations", "bingo"])
+    run_command(["python", manage_py, "makemigrations", "knowledge"])
+    run_command(["python", manage_py, "makemigrations", "obstacle"])
+    # databases from before winningNumber.num became unique may hold a number
+    # drawn twice, which would make `migrate` fail
+    run_command(["python", manage_py, "dedupe_draws"])
+    run_command(["python", manage_py, "migrate"])
+
+
 def run_django_commands():
     manage_py = locate_manage_py()
     try:
-        run_command(["python", manage_py, "makemigrations", "accounts"])
-        run_command(["python", manage_py, "makemigrations", "employees"])
-        run_command(["python", manage_py, "makemigrations", "bingo"])
-        run_command(["python", manage_py, "makemigrations", "knowledge"])
-        run_command(["python", manage_py, "makemigrations", "obstacle"])
-        run_command(["python", manage_py, "migrate"])
+        run_migrations(manage_py)
+    except subprocess.CalledProcessError as e:
+        # never carry on with a half-migrated schema
+        raise SystemExit(f"ERROR!!! While migrating the database:\n{e}")
+    try:
+        run_command(["python", manage_py, "pack_boards"])
         run_command(
             [
                 "python",
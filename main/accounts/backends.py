@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
 
+from accounts import queries as accounts_queries
 
 # from django.contrib.auth import get_user_model
 # from django.contrib.auth.backends import ModelBackend
@@ -10,14 +11,8 @@ UserModel = get_user_model()
 
 class CustomBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = UserModel.objects.get(username=username)
-        except UserModel.DoesNotExist:
-            try:
-                user = UserModel.objects.get(email=username)
-            except Exception:
-                return None
-        if user.check_password(password):
+        user = accounts_queries.find_login_user(username)
+        if user is not None and user.check_password(password):
             return user
         return None
 
@@ -30,11 +25,7 @@ class CustomBackend(ModelBackend):
 
 class NoPasswordBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = UserModel.objects.get(username=username)
-            return user
-        except UserModel.DoesNotExist:
-            return None
+        return accounts_queries.find_login_user(username)
 
     def get_user(self, user_id):
         try:
@@ -1,4 +1,6 @@
 # accounts/forms.py
+import logging
+
 from crispy_bootstrap5.bootstrap5 import FloatingField
 from crispy_forms.bootstrap import FormActions
 from crispy_forms.helper import FormHelper
@@ -12,15 +14,20 @@ from django.contrib.auth.forms import (
     UserCreationForm,
     UsernameField,
 )
+from django.contrib.auth.signals import user_login_failed
 from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef, Q
 from django.utils.text import capfirst
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.debug import sensitive_variables
 from employees import models as employees_models
 
 from accounts import models as accounts_models
+from accounts import queries as accounts_queries
 from main.utils import get_datetime_str
 
+lg = logging.getLogger("django")
+
 UserModel = get_user_model()
 
 
@@ -59,16 +66,19 @@ class AuthenticationFormNopassword(forms.Form):
 
         # if username is not None and password:
         if username is not None:
-            self.user_cache = UserModel.objects.filter(username=username).first()
-
-            if self.user_cache is None:
-                raise self.get_invalid_login_error()
-            if not self.user_cache.is_no_password:
+            self.user_cache = accounts_queries.find_login_user(username)
+
+            if self.user_cache is None or not self.user_cache.is_no_password:
+                # what `authenticate` signals for a failed password login
+                user_login_failed.send(
+                    sender=__name__,
+                    credentials={"username": username},
+                    request=self.request,
+                )
                 raise self.get_invalid_login_error()
 
-            else:
-                self.confirm_login_allowed(self.user_cache)
-                print(f"login is allowed for {self.user_cache}")
+            self.confirm_login_allowed(self.user_cache)
+            lg.debug(f"login is allowed for {self.user_cache}")
 
         return self.cleaned_data
 
@@ -148,18 +158,25 @@ class CustomUserCreationFormNopassword(forms.ModelForm):
         """this method will check if employee_id exists in EmployeeModel"""
         cleaned_data = super().clean()
         employee_id = cleaned_data.get("employee_id")
-        emp_obj = employees_models.EmployeeModel.objects.filter(
-            employee_id=employee_id
-        ).first()
+        users = UserModel.objects.filter(
+            Q(emp_id_obj=OuterRef("pk")) | Q(username=employee_id)
+        )
+        emp_obj = (
+            employees_models.EmployeeModel.objects.filter(
+                employee_id=employee_id, is_active=True
+            )
+            .annotate(has_user=Exists(users))
+            .first()
+        )
         if not emp_obj:
             raise forms.ValidationError(
                 f"Employee with ID {employee_id} does not exist!"
             )
-        user = UserModel.objects.filter(emp_id_obj=emp_obj).first()
-        if user:
+        if emp_obj.has_user:
             raise forms.ValidationError(
                 f"User with Employee ID {employee_id} already exists!"
             )
+        cleaned_data["employee"] = emp_obj
         return cleaned_data
 
 
@@ -184,7 +201,7 @@ class CustomUserLoginForm(AuthenticationForm):
 
     def clean(self):
         super().clean()
-        print(f"{self.cleaned_data=}")
+        lg.debug(f"login form cleaned for {self.cleaned_data.get('username')}")
         return self.cleaned_data
 
 
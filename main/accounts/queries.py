@@ -0,0 +1,127 @@
+# accounts/queries.py
+import threading
+import time
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    ExpressionWrapper,
+    OuterRef,
+    Q,
+    Value,
+    When,
+)
+from employees.models import EmployeeModel
+
+UserModel = get_user_model()
+
+# login identifier -> (expiry, user id); only lives through a login burst
+LOGIN_CACHE_TTL = 60.0
+LOGIN_CACHE_SIZE = 10000  # expired entries are purged beyond this size
+_login_cache: dict[str, tuple[float, int]] = {}
+_login_cache_lock = threading.Lock()
+
+
+def has_perm_expression(perm: str) -> ExpressionWrapper:
+    """SQL equivalent of `user.has_perm(perm)` for the ModelBackend rules:
+    active superusers have every permission, inactive users have none, and
+    everyone else needs it directly or through one of their groups."""
+    app_label, codename = perm.split(".", 1)
+    permissions = Permission.objects.filter(
+        content_type__app_label=app_label, codename=codename
+    )
+    granted = (
+        Q(is_superuser=True)
+        | Exists(permissions.filter(user=OuterRef("pk")))
+        | Exists(permissions.filter(group__user=OuterRef("pk")))
+    )
+    return ExpressionWrapper(Q(is_active=True) & granted, output_field=BooleanField())
+
+
+def annotate_permissions(queryset, perms: dict[str, str]):
+    """Annotates each user with one boolean per permission, e.g.
+    `annotate_permissions(qs, {"is_operator": "accounts.is_operator"})`,
+    so a whole user list is resolved in a single query."""
+    return queryset.annotate(
+        **{name: has_perm_expression(perm) for name, perm in perms.items()}
+    )
+
+
+def users_with_roles(perms: dict[str, str], exclude_usernames=("admin",)):
+    return annotate_permissions(
+        UserModel.objects.exclude(username__in=exclude_usernames).order_by("pk"),
+        perms,
+    )
+
+
+def login_lookup_queryset(identifier: str):
+    """Users matching `identifier` as username, email or employee id.
+
+    Every branch of the OR is answered from a unique index (username, email,
+    employee_id -> emp_id_obj), and an exact username match sorts first.
+    """
+    employees = EmployeeModel.objects.filter(employee_id=identifier).values("pk")
+    return (
+        UserModel.objects.select_related("emp_id_obj")
+        .filter(
+            Q(username=identifier) | Q(email=identifier) | Q(emp_id_obj__in=employees)
+        )
+        .order_by(
+            Case(
+                When(username=identifier, then=Value(0)),
+                When(email=identifier, then=Value(1)),
+                default=Value(2),
+            )
+        )
+    )
+
+
+def _matches(user, identifier: str) -> bool:
+    return identifier in (user.username, user.email) or (
+        user.emp_id_obj is not None and user.emp_id_obj.employee_id == identifier
+    )
+
+
+def find_login_user(identifier: Optional[str]):
+    """Resolves a username, email or employee id to a user in one query.
+
+    Resolved user ids are cached for `LOGIN_CACHE_TTL` seconds, so repeated
+    attempts during the login burst become a primary key lookup. A cached
+    user which no longer matches the identifier falls back to the full lookup.
+    """
+    if not identifier:
+        return None
+    now = time.monotonic()
+    with _login_cache_lock:
+        expiry, user_id = _login_cache.get(identifier, (0.0, None))
+    if user_id is not None and expiry > now:
+        user = UserModel.objects.select_related("emp_id_obj").filter(pk=user_id).first()
+        if user is not None and _matches(user, identifier):
+            return user
+
+    user = login_lookup_queryset(identifier).first()
+    if user is None:
+        with _login_cache_lock:
+            _login_cache.pop(identifier, None)
+    else:
+        cache_login_user(identifier, user.pk)
+    return user
+
+
+def cache_login_user(identifier: str, user_id: int) -> None:
+    now = time.monotonic()
+    with _login_cache_lock:
+        if len(_login_cache) >= LOGIN_CACHE_SIZE:
+            for key, (expiry, _) in list(_login_cache.items()):
+                if expiry <= now:
+                    del _login_cache[key]
+        _login_cache[identifier] = (now + LOGIN_CACHE_TTL, user_id)
+
+
+def clear_login_cache() -> None:
+    with _login_cache_lock:
+        _login_cache.clear()
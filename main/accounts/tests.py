@@ -1,3 +1,158 @@
+import time
+
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from employees.models import EmployeeModel
+
+from accounts import queries as accounts_queries
+from accounts.models import CustomUser
+
+
+class CustomUserListViewQueryCountTest(TestCase):
+    # literal path, reverse() would prepend settings.FORCE_SCRIPT_NAME
+    url = "/accounts/"
+    # session, request user, the annotated user list, and the request user's
+    # own user/group permissions for the template's `perms` checks
+    expected_queries = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = CustomUser.objects.create(
+            username="viewer", email="viewer@example.com"
+        )
+        cls.group = Group.objects.create(name="gamemasters")
+        cls.group.permissions.add(
+            Permission.objects.get(codename="is_gamemaster"),
+        )
+
+    def create_users(self, count: int) -> None:
+        CustomUser.objects.bulk_create(
+            CustomUser(username=f"user{i}", email=f"user{i}@example.com")
+            for i in range(count)
+        )
+        users = CustomUser.objects.filter(username__startswith="user")
+        self.group.user_set.add(*users[: count // 2])
+
+    def count_queries(self, count: int) -> int:
+        self.create_users(count)
+        self.client.force_login(self.viewer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["objects"]), count + 1)
+        return len(queries)
+
+    def test_query_count_10_users(self):
+        self.assertEqual(self.count_queries(10), self.expected_queries)
+
+    def test_query_count_100_users(self):
+        self.assertEqual(self.count_queries(100), self.expected_queries)
+
+    def test_query_count_1000_users(self):
+        self.assertEqual(self.count_queries(1000), self.expected_queries)
+
+
+class AnnotatePermissionsTest(TestCase):
+    def test_matches_has_perm(self):
+        group = Group.objects.create(name="gamemasters")
+        group.permissions.add(Permission.objects.get(codename="is_gamemaster"))
+        direct = CustomUser.objects.create(username="direct", email="d@example.com")
+        direct.user_permissions.add(Permission.objects.get(codename="is_admin"))
+        grouped = CustomUser.objects.create(username="grouped", email="g@example.com")
+        grouped.groups.add(group)
+        CustomUser.objects.create(username="plain", email="p@example.com")
+        CustomUser.objects.create(
+            username="root", email="r@example.com", is_superuser=True
+        )
+        CustomUser.objects.create(
+            username="inactive",
+            email="i@example.com",
+            is_superuser=True,
+            is_active=False,
+        )
+
+        perms = {
+            "is_admin": "accounts.is_admin",
+            "is_gamemaster": "accounts.is_gamemaster",
+            "is_operator": "accounts.is_operator",
+        }
+        users = accounts_queries.annotate_permissions(CustomUser.objects.all(), perms)
+        for user in users:
+            fresh = CustomUser.objects.get(pk=user.pk)
+            for name, perm in perms.items():
+                self.assertEqual(
+                    getattr(user, name), fresh.has_perm(perm), (user, perm)
+                )
+
+
+class LoginLookupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = EmployeeModel.objects.create(employee_id="00000042", name="Ann")
+        cls.user = CustomUser.objects.create(
+            username="ann", email="ann@example.com", emp_id_obj=cls.employee
+        )
+        # another user whose email is the first user's username
+        CustomUser.objects.create(username="other", email="ann")
+
+    def setUp(self):
+        accounts_queries.clear_login_cache()
+        self.addCleanup(accounts_queries.clear_login_cache)
+
+    def test_resolves_username_email_and_employee_id(self):
+        for identifier in ("ann", "ann@example.com", "00000042"):
+            with self.assertNumQueries(1):
+                user = accounts_queries.find_login_user(identifier)
+            self.assertEqual(user, self.user, identifier)
+        self.assertIsNone(accounts_queries.find_login_user("nobody"))
+
+    def test_cached_user_must_still_match(self):
+        accounts_queries.find_login_user("ann@example.com")
+        CustomUser.objects.filter(pk=self.user.pk).update(email="new@example.com")
+        # the cached user no longer matches, so the full lookup runs again
+        with self.assertNumQueries(2):
+            self.assertIsNone(accounts_queries.find_login_user("ann@example.com"))
+
+
+class LoginBurstLoadTest(TestCase):
+    """500 guests logging in without a password within the first minute."""
+
+    url = "/accounts/login-no-password/"
+    num_logins = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        employees = EmployeeModel.objects.bulk_create(
+            EmployeeModel(employee_id=f"{i:08d}", name=f"Guest {i}")
+            for i in range(cls.num_logins)
+        )
+        CustomUser.objects.bulk_create(
+            CustomUser(
+                username=emp.employee_id,
+                email=f"guest{i}@example.com",
+                emp_id_obj=emp,
+                is_no_password=True,
+            )
+            for i, emp in enumerate(employees)
+        )
+
+    def setUp(self):
+        accounts_queries.clear_login_cache()
+        self.addCleanup(accounts_queries.clear_login_cache)
+
+    def test_500_logins_within_60_seconds(self):
+        query_counts = set()
+        start = time.perf_counter()
+        for i in range(self.num_logins):
+            self.client.cookies.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, {"username": f"{i:08d}"})
+            self.assertEqual(response.status_code, 302, i)
+            query_counts.add(len(queries))
+        elapsed = time.perf_counter() - start
 
-# Create your tests here.
+        self.assertLess(elapsed, 60)
+        # one user lookup per login, independent of the number of users
+        self.assertEqual(len(query_counts), 1, query_counts)
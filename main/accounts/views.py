@@ -6,6 +6,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.contrib.auth.views import LoginView
 from django.core.mail import EmailMessage
+from django.http import HttpResponseRedirect
 from django.shortcuts import render
 from django.template.loader import render_to_string
 from django.urls import reverse_lazy
@@ -14,11 +15,11 @@ from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.views.generic.base import TemplateView
 from django.views.generic.edit import CreateView, UpdateView
 from django.views.generic.list import ListView
-from employees import models as employees_models
 from main.custom_mixin import CustomLoginRequiredMixin
 from main.utils import generate_random_email
 
 from accounts import forms as accounts_forms
+from accounts import queries as accounts_queries
 from accounts.tokens import account_activation_token
 
 UserModel = get_user_model()
@@ -49,25 +50,25 @@ class SignUpViewNopassword(CreateView):
     template_name = "registration/signup-nopassword.html"
 
     def form_valid(self, form):
+        # the form already checked the employee exists and has no user yet
         employee_id = form.cleaned_data.get("employee_id")
-        emp_obj = employees_models.EmployeeModel.objects.filter(
-            employee_id=employee_id
-        ).first()
-        user = UserModel.objects.filter(username=str(employee_id)).first()
-        if not user:
-            user = form.save(commit=False)
-            user.username = str(employee_id)
-            user.emp_id_obj = emp_obj
-            user.email = generate_random_email(name=employee_id)
-            user.is_active = True
-            user.is_no_password = True
-            user.preferred_name = emp_obj.name
-            user.save()
-            bingo_model = bingo_models.BingoBoard()
-            bingo_model.generateBoard()
-            bingo_model.owner = user
-            bingo_model.save()
-        return super().form_valid(form)
+        emp_obj = form.cleaned_data["employee"]
+        user = form.save(commit=False)
+        user.username = str(employee_id)
+        user.emp_id_obj = emp_obj
+        user.email = generate_random_email(name=employee_id)
+        user.is_active = True
+        user.is_no_password = True
+        user.preferred_name = emp_obj.name
+        user.save()
+        bingo_model = bingo_models.BingoBoard()
+        bingo_model.generateBoard()
+        bingo_model.owner = user
+        bingo_model.save()
+        # the new player usually logs in right away
+        accounts_queries.cache_login_user(user.username, user.pk)
+        self.object = user
+        return HttpResponseRedirect(self.get_success_url())
 
     def form_invalid(self, form):
         messages.add_message(
@@ -134,23 +135,26 @@ class CustomUserListView(CustomLoginRequiredMixin, ListView):
     model = UserModel
     template_name = "accounts/users_list.html"
     context_object_name = "objects"
+    roles = {
+        "is_operator": "accounts.is_operator",
+        "is_engineer": "accounts.is_engineer",
+        "is_approver": "accounts.is_approver",
+        "is_endorser": "accounts.is_endorser",
+    }
+
+    def get_queryset(self):
+        # permissions are resolved in SQL, not with has_perm() per user
+        return accounts_queries.users_with_roles(self.roles)
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        user_obj_list = [obj for obj in context["objects"]]
-        objects = []
-        for user_obj in user_obj_list:
-            if user_obj.username == "admin":
-                continue
-            data = {
+        context["objects"] = [
+            {
                 "user_obj": user_obj,
-                "is_operator": user_obj.has_perm("accounts.is_operator"),
-                "is_engineer": user_obj.has_perm("accounts.is_engineer"),
-                "is_approver": user_obj.has_perm("accounts.is_approver"),
-                "is_endorser": user_obj.has_perm("accounts.is_endorser"),
+                **{role: getattr(user_obj, role) for role in self.roles},
             }
-            objects.append(data)
-        context["objects"] = objects
+            for user_obj in context["objects"]
+        ]
         return context
 
 
@@ -3,4 +3,6 @@ from . import models
 
 # Register your models here.
 admin.site.register(models.BingoBoard)
-admin.site.register(models.winningNumber)
\ No newline at end of file
+admin.site.register(models.winningNumber)
+admin.site.register(models.BingoWinner)
+admin.site.register(models.AutoDrawSchedule)
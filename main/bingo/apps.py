@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class BingoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bingo'
+
+    def ready(self):
+        from accounts.models import CustomUser
+        from django.db.models.signals import post_delete, post_save
+
+        from . import signals
+
+        post_save.connect(signals.player_saved, sender=CustomUser)
+        post_delete.connect(signals.player_deleted, sender=CustomUser)
@@ -0,0 +1,160 @@
+# main/bingo/broker.py
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from django.db import DatabaseError, connection
+
+from .models import GameCounter, winningNumber
+
+lg = logging.getLogger("django")
+
+PROJECTOR_NUMBERS = 7
+
+
+class DrawBroker:
+    """Tiny in-process pub/sub used to push draw events to open event streams.
+
+    Subscribers are asyncio queues living on the event loop of the streaming
+    request; publishers may be any thread (sync views run in a thread pool
+    under ASGI), so events are handed over with `call_soon_threadsafe`.
+    """
+
+    queue_size: int = 16
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._last_event: Optional[dict] = None
+
+    @property
+    def num_subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Queue]:
+        """Must be entered from the event loop which will consume the queue."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def publish(self, event: dict) -> None:
+        """Events carry the full projector state, so one repeating the last
+        event (e.g. a draw seen both in-process and by `DrawWatcher`) is
+        dropped."""
+        with self._lock:
+            if event == self._last_event:
+                return
+            self._last_event = event
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # the subscriber's loop has already been closed
+                pass
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, event: dict) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # every event carries the full projector state, so a slow client
+            # only misses intermediate frames
+            lg.warning("draw event dropped for slow subscriber")
+
+
+class DrawWatcher:
+    """Publishes draws and resets made by other processes, e.g. by the
+    `autodraw` daemon, to this process's broker.
+
+    A daemon thread, started by the first `subscribe()`, reads the
+    `GameCounter` row every `interval` seconds while anyone is subscribed:
+    one tiny query per process instead of a poll per open stream.
+    """
+
+    interval = 0.3  # seconds
+
+    def __init__(self, broker: DrawBroker) -> None:
+        self.broker = broker
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="draw-watcher", daemon=True
+                )
+                self._thread.start()
+
+    def run(self) -> None:
+        seen = None
+        while True:
+            time.sleep(self.interval)
+            if not self.broker.num_subscribers:
+                if seen is not None:
+                    # idle: release the connection, re-sync on the next subscriber
+                    connection.close()
+                    seen = None
+                continue
+            try:
+                seen = self.check(seen)
+            except DatabaseError:
+                lg.exception("draw watcher could not read the game counter")
+                connection.close()
+
+    @staticmethod
+    def check(seen: Optional[tuple[int, int]]) -> tuple[int, int]:
+        """Publishes the current state if `(game, draw_seq)` moved on from
+        `seen`, which is None when (re)starting, and returns the new one."""
+        _, game, draw_seq = GameCounter.objects.current()
+        if (game, draw_seq) == seen:
+            return seen
+        if seen is not None and seen[0] != game:
+            publish_reset()
+            if not draw_seq:
+                return game, draw_seq
+        # also when (re)starting: a draw may have landed between a new
+        # subscriber reading the state and the first check
+        publish_draw()
+        return game, draw_seq
+
+
+broker = DrawBroker()
+watcher = DrawWatcher(broker)
+
+
+@contextmanager
+def subscribe() -> Iterator[asyncio.Queue]:
+    """Subscribes to the draw events of all processes, see `DrawWatcher`."""
+    watcher.ensure_started()
+    with broker.subscribe() as queue:
+        yield queue
+
+
+def latest_numbers(limit: int = PROJECTOR_NUMBERS) -> list[int]:
+    """Most recently drawn numbers, newest first."""
+    return list(
+        winningNumber.objects.order_by("-seq").values_list("num", flat=True)[:limit]
+    )
+
+
+def draw_event(num_drawn: int, latest: list[int], kind: str = "draw") -> dict:
+    return {"type": kind, "num_drawn": num_drawn, "latest": latest}
+
+
+def publish_draw() -> None:
+    broker.publish(draw_event(winningNumber.objects.count(), latest_numbers()))
+
+
+def publish_reset() -> None:
+    broker.publish(draw_event(0, [], kind="reset"))
@@ -0,0 +1,88 @@
+# main/bingo/draws.py
+import logging
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from django.db import transaction
+from main import metrics
+
+from .broker import publish_draw
+from .engine import save_board_states, sync_engine
+from .models import BingoSettings, BingoWinner, DrawPool, GameCounter, winningNumber
+
+lg = logging.getLogger("django")
+
+# serialises draws within a worker, so a second click waits for the first
+# draw and is then coalesced instead of contending for the database lock
+_draw_lock = threading.Lock()
+
+
+class OutOfNumbers(Exception):
+    pass
+
+
+class DrawResult(NamedTuple):
+    num: Optional[int]  # None when no number was drawn by this request
+    seq: int  # sequence of the last draw of the game
+    drawn: bool  # False when coalesced into a draw which already happened
+    validate_ms: float = 0.0  # time spent checking the boards for winners
+
+
+def pop_next_number(seq: int) -> int:
+    """Pops the next number off the pre-shuffled draw pool and records it as
+    draw `seq`. Must run inside the draw transaction.
+
+    The pool is created lazily (e.g. for games started before the pool
+    existed) from the settings range minus the numbers already drawn.
+    """
+    entry = DrawPool.objects.order_by("position").first()
+    if entry is None:
+        settings = BingoSettings.load()
+        drawn = winningNumber.objects.values_list("num", flat=True)
+        if not DrawPool.objects.refill(settings, exclude=drawn):
+            raise OutOfNumbers("out of numbers")
+        entry = DrawPool.objects.order_by("position").first()
+    entry.delete()
+    winningNumber.objects.create(num=entry.num, seq=seq)
+    return entry.num
+
+
+def draw(expected_seq: Optional[int] = None) -> DrawResult:
+    """Draws a number, updates the boards containing it and notifies listeners.
+
+    The whole pipeline runs in one transaction which takes the write lock
+    first (see `GameCounterManager.advance`). When `expected_seq`, the last
+    draw the caller has seen, is already outdated, another request drew in
+    the meantime and this one is coalesced into it without drawing.
+    """
+    with _draw_lock:
+        with transaction.atomic():
+            seq = GameCounter.objects.advance()
+            if expected_seq is not None and seq != expected_seq + 1:
+                transaction.set_rollback(True)
+                lg.info(f"draw coalesced: expected seq {expected_seq}, at {seq - 1}")
+                metrics.DRAWS.inc(result="coalesced")
+                return DrawResult(None, seq - 1, False)
+
+            num = pop_next_number(seq)
+            started = time.perf_counter()
+            current_winning_numbers = list(
+                winningNumber.objects.values_list("num", flat=True)
+            )
+            # Only the boards containing the new number need re-checking
+            engine, touched_boards = sync_engine(current_winning_numbers)
+            new_winners = engine.new_winners(touched_boards)
+            num_saved = save_board_states(engine, touched_boards)
+            if new_winners:
+                BingoWinner.objects.record(new_winners, draw_seq=seq, num=num)
+            validate_ms = (time.perf_counter() - started) * 1000
+    lg.info(
+        f"drew {num} as draw {seq}: {num_saved} boards updated, "
+        f"{len(new_winners)} new winners, {len(engine.winners)} winners "
+        f"in {validate_ms:.1f}ms"
+    )
+    metrics.DRAWS.inc(result="drawn")
+    metrics.DRAW_VALIDATION.observe(validate_ms / 1000)
+    publish_draw()
+    return DrawResult(num, seq, True, validate_ms)
@@ -0,0 +1,189 @@
+# main/bingo/engine.py
+import logging
+import threading
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from . import storage
+from .models import BingoBoard
+
+lg = logging.getLogger("django")
+
+
+class WinnerEngine:
+    """Incremental winner detection across all bingo boards.
+
+    Keeps an inverted index of number -> (board, cell) plus a marked-cells
+    bitmask per board, so that applying a draw only touches the boards which
+    actually contain the drawn number, and only checks the (at most four)
+    precomputed line masks passing through the newly marked cell.
+    """
+
+    def __init__(self, signature: Optional[tuple] = None) -> None:
+        self.signature = signature
+        self.drawn: set[int] = set()
+        self.winners: set[int] = set()
+        self._index: dict[int, list[tuple[int, int]]] = defaultdict(list)
+        self._dims: dict[int, int] = {}
+        self._marked: dict[int, int] = {}  # board id -> marked cells bitmask
+        # board id -> (is_winner, marked mask) as last written to the database
+        self._persisted: dict[int, tuple[bool, int]] = {}
+
+    @classmethod
+    def from_boards(
+        cls, boards: Iterable[BingoBoard], signature: Optional[tuple] = None
+    ) -> "WinnerEngine":
+        engine = cls(signature)
+        for board in boards:
+            engine.add_board(board.pk, board.grid.tolist())
+            engine._persisted[board.pk] = (board.is_winner, board.marked_mask)
+        return engine
+
+    @property
+    def board_ids(self) -> list[int]:
+        return list(self._dims)
+
+    def add_board(self, board_id: int, grid: list[list[int]]) -> None:
+        dims = len(grid)
+        self._dims[board_id] = dims
+        self._marked[board_id] = 0
+        for row, numbers in enumerate(grid):
+            for col, num in enumerate(numbers):
+                self._index[int(num)].append((board_id, row * dims + col))
+        for num in self.drawn:
+            self._mark(num, only_board=board_id)
+
+    def apply_draw(self, num: int) -> set[int]:
+        """Marks `num` on every board containing it.
+
+        Returns the ids of the boards whose marked state changed.
+        """
+        if num in self.drawn:
+            return set()
+        self.drawn.add(num)
+        return self._mark(num)
+
+    def _mark(self, num: int, only_board: Optional[int] = None) -> set[int]:
+        touched = set()
+        for board_id, cell in self._index.get(num, ()):
+            if only_board is not None and board_id != only_board:
+                continue
+            bit = 1 << cell
+            mask = self._marked[board_id]
+            if mask & bit:
+                continue
+            mask |= bit
+            self._marked[board_id] = mask
+            touched.add(board_id)
+
+            cell_lines = storage.cell_line_masks(self._dims[board_id])[cell]
+            if any((mask & m) == m for m in cell_lines):
+                self.winners.add(board_id)
+        return touched
+
+    def is_winner(self, board_id: int) -> bool:
+        return board_id in self.winners
+
+    def marked_mask(self, board_id: int) -> int:
+        return self._marked[board_id]
+
+    def dims(self, board_id: int) -> int:
+        return self._dims[board_id]
+
+    def state(self, board_id: int) -> tuple[bool, int]:
+        return (board_id in self.winners, self._marked[board_id])
+
+    def changed_boards(self, board_ids: Iterable[int]) -> list[int]:
+        """Boards whose state differs from what was last persisted."""
+        return [i for i in board_ids if self.state(i) != self._persisted.get(i)]
+
+    def new_winners(self, board_ids: Iterable[int]) -> list[int]:
+        """Winning boards which were not yet persisted as winners."""
+        return [
+            i
+            for i in board_ids
+            if i in self.winners and not self._persisted.get(i, (False, 0))[0]
+        ]
+
+    def mark_persisted(self, board_ids: Iterable[int]) -> None:
+        for board_id in board_ids:
+            self._persisted[board_id] = self.state(board_id)
+
+
+_engine: Optional[WinnerEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_board_signature() -> tuple:
+    """Cheap fingerprint of the set of boards; changes on reset or new sign-ups."""
+    agg = BingoBoard.objects.aggregate(count=Count("id"), last=Max("id"))
+    return (agg["count"], agg["last"])
+
+
+def sync_engine(winning_numbers: Iterable[int]) -> tuple[WinnerEngine, set[int]]:
+    """Brings the process-local engine up to date with the drawn numbers.
+
+    The engine is rebuilt from the database only when the boards changed or
+    the draws were reset; otherwise only the newly drawn numbers are applied.
+    Returns the engine and the ids of the boards whose state changed.
+    """
+    global _engine
+    winning_numbers = list(winning_numbers)
+    with _engine_lock:
+        signature = get_board_signature()
+        touched: set[int] = set()
+        if (
+            _engine is None
+            or _engine.signature != signature
+            or not _engine.drawn.issubset(winning_numbers)
+        ):
+            lg.info(f"rebuilding bingo winner engine for {signature=}")
+            _engine = WinnerEngine.from_boards(
+                BingoBoard.objects.only(
+                    "id", "cells", "board", "is_winner", "marked_bits"
+                ),
+                signature,
+            )
+            touched.update(_engine.board_ids)
+        for num in winning_numbers:
+            touched |= _engine.apply_draw(num)
+        return _engine, touched
+
+
+def save_board_states(
+    engine: WinnerEngine, board_ids: Iterable[int], batch_size: int = 500
+) -> int:
+    """Persists `is_winner` and the marked cells of the given boards.
+
+    Only boards whose state actually changed are written, with one
+    `bulk_update` of just those two columns inside a single transaction.
+    Returns the number of boards written.
+    """
+    changed = engine.changed_boards(board_ids)
+    if not changed:
+        return 0
+    boards = [
+        BingoBoard(
+            pk=board_id,
+            is_winner=engine.is_winner(board_id),
+            marked_bits=storage.pack_mask(
+                engine.marked_mask(board_id), engine.dims(board_id)
+            ),
+        )
+        for board_id in changed
+    ]
+    with transaction.atomic():
+        BingoBoard.objects.bulk_update(
+            boards, ["is_winner", "marked_bits"], batch_size=batch_size
+        )
+    engine.mark_persisted(changed)
+    return len(changed)
+
+
+def reset_engine() -> None:
+    global _engine
+    with _engine_lock:
+        _engine = None
@@ -0,0 +1,72 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from bingo import scheduler
+from bingo.models import AutoDrawSchedule
+
+lg = logging.getLogger("django")
+
+
+class Command(BaseCommand):
+    help = "daemon drawing numbers at the period set in the GM controls, run one per deployment"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=1.0,
+            help="max seconds between schedule checks, i.e. how fast start/pause are picked up",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="check the schedule once and exit"
+        )
+
+    def tick(self) -> float:
+        """Runs a due draw and returns how long to sleep before the next check."""
+        close_old_connections()
+        try:
+            result = scheduler.run_due()
+            next_draw_at = AutoDrawSchedule.objects.load().next_draw_at
+        except Exception as e:
+            # e.g. "database is locked": keep polling, the next slot may work
+            lg.exception("auto-draw failed")
+            self.record_error(e)
+            return self.poll
+        if result is not None and result.drawn:
+            self.stdout.write(
+                f"drew {result.num} as draw {result.seq}, "
+                f"validated in {result.validate_ms:.1f}ms"
+            )
+        if next_draw_at is None:
+            return self.poll
+        return min(max((next_draw_at - timezone.now()).total_seconds(), 0), self.poll)
+
+    @staticmethod
+    def record_error(error: Exception) -> None:
+        """Shows the error on the GM page until the next successful draw."""
+        message = f"{type(error).__name__}: {error}"
+        max_length = AutoDrawSchedule._meta.get_field("last_error").max_length
+        try:
+            AutoDrawSchedule.objects.filter(pk=1).update(
+                last_error=message[:max_length]
+            )
+        except DatabaseError:
+            lg.exception("could not record the auto-draw error")
+
+    def handle(self, *args, **options):
+        self.poll = options["poll"]
+        if options["once"]:
+            self.tick()
+            return
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(f"auto-draw polling every {self.poll}s")
+        )
+        try:
+            while True:
+                time.sleep(self.tick())
+        except KeyboardInterrupt:
+            self.stdout.write("auto-draw daemon stopped")
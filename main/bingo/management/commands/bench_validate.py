@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from bingo import batch
+from bingo.models import BingoBoard
+
+
+class Command(BaseCommand):
+    help = "benchmark per-board validate_board against the vectorised batch validator"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n", "--sizes", nargs="+", type=int, default=[100, 1000, 10000]
+        )
+        parser.add_argument("--dims", type=int, default=7)
+        parser.add_argument("--start-num", type=int, default=1)
+        parser.add_argument("--end-num", type=int, default=120)
+        parser.add_argument("--drawn", type=int, default=40)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def make_boards(self, count: int, options: dict) -> list[BingoBoard]:
+        dims = options["dims"]
+        numbers = range(options["start_num"], options["end_num"] + 1)
+        boards = []
+        for pk in range(1, count + 1):
+            cells = random.sample(numbers, dims * dims)
+            board = BingoBoard(pk=pk)
+            board.set_grid([cells[i * dims : (i + 1) * dims] for i in range(dims)])
+            boards.append(board)
+        return boards
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        numbers = list(range(options["start_num"], options["end_num"] + 1))
+        winning_numbers = random.sample(numbers, options["drawn"])
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"dims={options['dims']} drawn={len(winning_numbers)}"
+            )
+        )
+        for size in options["sizes"]:
+            boards = self.make_boards(size, options)
+
+            t0 = time.perf_counter()
+            expected = {
+                b.pk for b in boards if b.validate_board(winning_numbers).is_winner
+            }
+            per_board = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            results = batch.validate_boards(boards, winning_numbers)
+            vectorised = time.perf_counter() - t0
+
+            winners = {pk for result in results for pk in result.winner_ids}
+            if winners != expected:
+                self.stdout.write(
+                    self.style.ERROR(f"{size=} winner mismatch: {winners ^ expected}")
+                )
+            self.stdout.write(
+                f"{size:>7} boards | validate_board {per_board * 1000:9.1f} ms"
+                f" | batch {vectorised * 1000:8.1f} ms"
+                f" | speedup x{per_board / max(vectorised, 1e-9):.0f}"
+                f" | winners {len(winners)}"
+            )
+        self.stdout.write(self.style.SUCCESS("benchmark complete"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from bingo.models import winningNumber
+
+
+class Command(BaseCommand):
+    help = (
+        "delete numbers drawn twice, keeping the first draw; run before `migrate` "
+        "on databases from before winningNumber.num became unique"
+    )
+
+    def handle(self, *args, **options):
+        table = winningNumber._meta.db_table
+        if table not in connection.introspection.table_names():
+            self.stdout.write("no draws table yet, nothing to deduplicate")
+            return
+        # raw SQL: the table may still lack columns the model declares
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id NOT IN "
+                f"(SELECT MIN(id) FROM {table} GROUP BY num)"
+            )
+            deleted = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(f"{deleted} duplicate draws deleted"))
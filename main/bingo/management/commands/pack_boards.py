@@ -0,0 +1,32 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bingo import storage
+from bingo.models import BingoBoard, winningNumber
+
+
+class Command(BaseCommand):
+    help = "convert legacy JSON bingo boards to the packed binary storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        drawn = list(winningNumber.objects.values_list("num", flat=True))
+        legacy = BingoBoard.objects.filter(cells__isnull=True, board__isnull=False)
+        total = 0
+        with transaction.atomic():
+            while True:
+                boards = list(legacy.only("id", "board")[: options["batch_size"]])
+                if not boards:
+                    break
+                for board in boards:
+                    board.set_grid(board.board)
+                    board.marked_mask = storage.mask_from_marked(
+                        np.isin(board.grid, drawn)
+                    )
+                BingoBoard.objects.bulk_update(
+                    boards, ["board", "cells", "marked_bits"]
+                )
+                total += len(boards)
+        self.stdout.write(self.style.SUCCESS(f"{total} boards packed"))
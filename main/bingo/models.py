@@ -1,17 +1,47 @@
-from django.db import models
-from django.db.models import JSONField, IntegerField
+from django.db import models, transaction
+from django.db.models import F, JSONField, IntegerField, Max
+from django.utils import timezone
 import random
-import pandas as pd
+import threading
+import time
+import numpy as np
 import logging as lg 
 from accounts import models as accounts_models
+from . import batch, storage
+
+
+class BingoBoardManager(models.Manager):
+    def reset_for_players(self, players, seed=None) -> list["BingoBoard"]:
+        """Replaces every board and drawn number with one fresh board per player.
+
+        Settings are read once, all boards are generated in a single vectorised
+        step and written with `bulk_create` inside one transaction.
+        """
+        players = list(players)
+        settings = BingoSettings.load()
+        grids = batch.generate_grids(
+            len(players), settings.start_num, settings.end_num, settings.dims, seed
+        )
+        boards = [
+            self.model(owner=player, cells=storage.pack_grid(grid))
+            for player, grid in zip(players, grids)
+        ]
+        with transaction.atomic():
+            winningNumber.objects.all().delete()
+            GameCounter.objects.reset()
+            DrawPool.objects.refill(settings, seed=seed)
+            self.all().delete()
+            return self.bulk_create(boards)
+
 
 # Create your models here.
 class BingoBoard(models.Model):
 
-    board = models.JSONField()
+    # Legacy nested-list board, converted to `cells` by `manage.py pack_boards`
+    board = models.JSONField(null=True, blank=True)
+    cells = models.BinaryField(null=True)  # packed board, see bingo.storage
     is_winner = models.BooleanField(default=False)
-    df_marked = None  # Not a database field, for temporary storage
-    json_str_marked = models.JSONField(null=True, blank=True) # Store marked board data as JSON
+    marked_bits = models.BinaryField(null=True, blank=True)  # marked cells bitmask
 
     owner = models.OneToOneField(
         accounts_models.CustomUser,
@@ -20,13 +50,40 @@ class BingoBoard(models.Model):
         blank=True,        # Allows the field to be blank in forms/admin
         related_name='bingo_board' # Access board from employee: employee_instance.bingo_board
     )
+
+    objects = BingoBoardManager()
+
+    @property
+    def grid(self):
+        """Board numbers as a read-only (dims, dims) NumPy view."""
+        if self.cells is None and self.board is not None:
+            return np.asarray(self.board)
+        return storage.unpack_grid(self.cells)
+
+    def set_grid(self, grid) -> None:
+        self.cells = storage.pack_grid(grid)
+        self.board = None
+
+    @property
+    def dims(self) -> int:
+        return len(self.grid)
+
+    @property
+    def marked_mask(self) -> int:
+        return storage.unpack_mask(self.marked_bits)
+
+    @marked_mask.setter
+    def marked_mask(self, mask: int) -> None:
+        self.marked_bits = storage.pack_mask(mask, self.dims)
+
+    @property
+    def marked(self):
+        """Marked cells as a (dims, dims) boolean NumPy array."""
+        return storage.marked_from_mask(self.marked_mask, self.dims)
     
     def generateBoard(self):
 
-        if(not BingoSettings.objects.exists()):
-            BingoSettings().save()
-
-        settings = BingoSettings.objects.all().first()
+        settings = BingoSettings.load()
 
         number_list = list(range(settings.start_num, settings.end_num+1))
         random.shuffle(number_list)
@@ -35,10 +92,7 @@ class BingoBoard(models.Model):
         for i in range(settings.dims):
             for j in range(settings.dims):
                 board[i][j] = number_list.pop()
-        self.board = board
-    
-    def to_dataframe(self):
-        return pd.DataFrame(self.board)
+        self.set_grid(board)
     
     def validate_board(
         self, winning_numbers: list, print_marked_board: bool = False
@@ -50,67 +104,240 @@ class BingoBoard(models.Model):
             self.is_winner = False
             return self
 
-        # Convert winning numbers to a set for efficient lookups
-        winning_set = set(winning_numbers)
+        # Mark every cell whose number has been drawn, as a bitmask
+        grid = self.grid
+        marked = np.isin(grid, list(winning_numbers))
+        self.marked_mask = storage.mask_from_marked(marked)
+        if print_marked_board:
+            lg.info(f"Marked board:\n{self.marked}")
 
-        # Convert the board matrix to a pandas DataFrame
-        df_board = self.to_dataframe()
+        # A board wins when every cell of one row, column or diagonal is marked
+        self.is_winner = storage.is_winning_mask(self.marked_mask, len(grid))
+        return self
 
-        # Create a boolean DataFrame where True indicates a number is in winning_set
-        df_marked = df_board.isin(winning_set)
-        self.df_marked = df_marked  # Store marked DataFrame in the board instance
-        self.json_str_marked = df_marked.to_json()  # Store marked data as json
-        if print_marked_board:
-            dfm = df_marked.replace({False: " ", True: "W"})
-            #lg.info(f"Marked board:\n{dfm}")
+class winningNumber(models.Model):
+    num = IntegerField(unique=True)
+    # 1-based position of the draw within the current game, see GameCounter;
+    # null only for numbers drawn before the column existed
+    seq = models.PositiveIntegerField(unique=True, null=True)
+    drawn_at = models.DateTimeField(default=timezone.now)
 
-        board_size = len(self.board)
+    class Meta:
+        indexes = [
+            # covers `ORDER BY seq DESC LIMIT n` of the projector and the
+            # `seq > n` deltas of the game state without touching the table
+            models.Index(fields=["-seq", "num"], name="bingo_draw_seq_num_idx"),
+        ]
 
-        # Check rows: if any row is all True
-        if df_marked.all(axis=1).any():
-            winning_row_idx = df_marked.all(axis=1).idxmax()
-            #lg.debug(f"Winning row found: {df_board.loc[winning_row_idx].tolist()}")
-            self.is_winner = True
-            return self
 
-        # Check columns: if any column is all True
-        if df_marked.all(axis=0).any():
-            winning_col_idx = df_marked.all(axis=0).idxmax()
-            #lg.debug(f"Winning column found: {df_board[winning_col_idx].tolist()}")
-            self.is_winner = True
-            return self
+class BingoWinnerManager(models.Manager):
+    def record(self, board_ids, draw_seq: int, num: int) -> list["BingoWinner"]:
+        """Writes a winner row for each board, copying the owner's display
+        fields so leaderboards never need to join back to the users table."""
+        boards = BingoBoard.objects.filter(pk__in=board_ids).select_related("owner")
+        winners = [
+            self.model(
+                board=board,
+                owner=board.owner,
+                draw_seq=draw_seq,
+                winning_number=num,
+                preferred_name=board.owner.preferred_name if board.owner else "",
+                username=(board.owner.username or "") if board.owner else "",
+            )
+            for board in boards.only(
+                "id", "owner__id", "owner__preferred_name", "owner__username"
+            )
+        ]
+        return self.bulk_create(winners, ignore_conflicts=True)
 
-        # Check main diagonal (top-left to bottom-right)
-        # Extract the main diagonal as a pandas Series and check if all are True
-        main_diag_marked = pd.Series([df_marked.iloc[i, i] for i in range(board_size)])
-        if main_diag_marked.all():
-            main_diag_numbers = [int(df_board.iloc[i, i]) for i in range(board_size)]
-            #lg.debug(f"Winning main diagonal found: {main_diag_numbers}")
-            self.is_winner = True
-            return self
 
-        # Check anti-diagonal (top-right to bottom-left)
-        # Extract the anti-diagonal as a pandas Series and check if all are True
-        anti_diag_marked = pd.Series(
-            [df_marked.iloc[i, board_size - 1 - i] for i in range(board_size)]
-        )
-        if anti_diag_marked.all():
-            anti_diag_numbers = [
-                int(df_board.iloc[i, board_size - 1 - i]) for i in range(board_size)
-            ]
-            #lg.debug(f"Winning anti-diagonal found: {anti_diag_numbers}")
-            self.is_winner = True
-            return self
+class BingoWinner(models.Model):
+    """Denormalised record of a winning board, written when the win is detected."""
 
-        # If no winning line is found
-        #lg.debug("No winning line found on the board.")
-        self.is_winner = False
-        return self
+    board = models.OneToOneField(
+        BingoBoard, on_delete=models.CASCADE, related_name="winner"
+    )
+    owner = models.ForeignKey(
+        accounts_models.CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="bingo_wins",
+    )
+    draw_seq = models.PositiveIntegerField(db_index=True)  # n-th draw of the game
+    winning_number = models.IntegerField()
+    preferred_name = models.CharField(blank=True, max_length=64)
+    username = models.CharField(blank=True, max_length=32)
+    won_at = models.DateTimeField(auto_now_add=True)
 
-class winningNumber(models.Model):
-    num = IntegerField()
+    objects = BingoWinnerManager()
+
+    class Meta:
+        ordering = ["draw_seq", "id"]
+
+    def __str__(self):
+        return f"{self.username} (draw {self.draw_seq})"
 
 class BingoSettings(models.Model):
     start_num = models.IntegerField(default = 1)
     end_num = models.IntegerField(default = 120)
-    dims = models.IntegerField(default = 7)
\ No newline at end of file
+    dims = models.IntegerField(default = 7)
+    version = models.PositiveIntegerField(default=0)  # bumped on every save
+
+    # How long (seconds) a worker trusts its cached copy before re-checking
+    # `pk` and `version` in the database; saves in the same worker invalidate at once.
+    cache_ttl = 2.0
+    _cache = {"obj": None, "checked": 0.0}
+    _cache_lock = threading.RLock()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # bump atomically so concurrent saves from other workers are never lost
+        BingoSettings.objects.filter(pk=self.pk).update(version=F("version") + 1)
+        self.refresh_from_db(fields=["version"])
+        BingoSettings.invalidate_cache()
+
+    @classmethod
+    def invalidate_cache(cls) -> None:
+        with cls._cache_lock:
+            cls._cache["obj"] = None
+
+    @classmethod
+    def load(cls) -> "BingoSettings":
+        """Returns the game settings singleton from a process-local cache.
+
+        Costs no query while the cache is fresh, and one tiny version check
+        every `cache_ttl` seconds to pick up changes made by other workers.
+        Treat the result as read-only; use `objects` to edit the settings.
+        """
+        with cls._cache_lock:
+            cached = cls._cache["obj"]
+            now = time.monotonic()
+            if cached is not None and now - cls._cache["checked"] < cls.cache_ttl:
+                return cached
+
+            # the pk catches a row replaced by another worker with the same version
+            key = cls.objects.values_list("pk", "version").first()
+            if cached is None or key != (cached.pk, cached.version):
+                cached = cls.objects.first() or cls.objects.create()
+            cls._cache["obj"] = cached
+            cls._cache["checked"] = now
+            return cached
+
+
+class DrawPoolManager(models.Manager):
+    def refill(self, settings, exclude=(), seed=None) -> int:
+        """Replaces the pool with a fresh shuffle of every number in the
+        settings range which has not been drawn yet (`exclude`)."""
+        exclude = set(exclude)
+        numbers = [
+            n
+            for n in range(settings.start_num, settings.end_num + 1)
+            if n not in exclude
+        ]
+        random.Random(seed).shuffle(numbers)
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                self.model(position=i, num=n) for i, n in enumerate(numbers)
+            )
+        return len(numbers)
+
+
+class DrawPool(models.Model):
+    """Remaining numbers of the current game, pre-shuffled at game start.
+
+    Drawing pops the entry with the lowest position, so every draw costs the
+    same whatever fraction of the range has already been drawn.
+    """
+
+    position = models.PositiveIntegerField(unique=True)
+    num = models.IntegerField()
+
+    objects = DrawPoolManager()
+
+
+class GameCounterManager(models.Manager):
+    def advance(self) -> int:
+        """Increments the draw sequence and returns the new value.
+
+        Meant as the first statement of the draw transaction: the UPDATE makes
+        SQLite take its write lock before anything is read (the same effect as
+        BEGIN IMMEDIATE), so concurrent draws queue on the busy timeout instead
+        of failing to upgrade a read snapshot.
+        """
+        updated = self.filter(pk=1).update(
+            draw_seq=F("draw_seq") + 1, version=F("version") + 1
+        )
+        if not updated:
+            self._create_row(draws=1)
+        return self.values_list("draw_seq", flat=True).get(pk=1)
+
+    def current_seq(self) -> int:
+        return self.filter(pk=1).values_list("draw_seq", flat=True).first() or 0
+
+    def current(self) -> tuple[int, int, int]:
+        """(version, game, draw_seq) of the game."""
+        row = self.filter(pk=1).values_list("version", "game", "draw_seq").first()
+        return row or (0, 0, 0)
+
+    def bump(self, **fields) -> None:
+        """Marks the game state as changed, e.g. when players join or leave."""
+        if not self.filter(pk=1).update(version=F("version") + 1, **fields):
+            self._create_row(**fields)
+
+    def reset(self) -> None:
+        """Starts a new game: the draw sequence restarts at 0 in a new `game`."""
+        if not self.filter(pk=1).update(
+            version=F("version") + 1, game=F("game") + 1, draw_seq=0
+        ):
+            self.create(pk=1, version=1, game=1)
+
+    def _create_row(self, draws: int = 0, **fields) -> None:
+        """Creates the missing row, e.g. on a database upgraded mid-game:
+        legacy draws are numbered first so the sequence continues after them,
+        `draws` being added on top."""
+        self.create(pk=1, draw_seq=self._backfill_seq() + draws, version=1, **fields)
+
+    def _backfill_seq(self) -> int:
+        """Numbers legacy draws without a sequence in drawing order and
+        returns the last sequence of the current game."""
+        legacy = list(winningNumber.objects.filter(seq__isnull=True).order_by("id"))
+        last = winningNumber.objects.aggregate(seq=Max("seq"))["seq"] or 0
+        for number in legacy:
+            last += 1
+            number.seq = last
+        winningNumber.objects.bulk_update(legacy, ["seq"])
+        return last
+
+
+class GameCounter(models.Model):
+    """Singleton row (pk=1) holding the sequence of the last draw, the number
+    of resets and a version which changes whenever the cached
+    `bingo.state.GameState` is outdated."""
+
+    draw_seq = models.PositiveIntegerField(default=0)
+    game = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)
+
+    objects = GameCounterManager()
+
+
+class AutoDrawScheduleManager(models.Manager):
+    def load(self) -> "AutoDrawSchedule":
+        return self.get_or_create(pk=1)[0]
+
+
+class AutoDrawSchedule(models.Model):
+    """Singleton row (pk=1) shared by the GM controls, which start and pause
+    it, and the `autodraw` daemon, which draws whenever `next_draw_at` is due."""
+
+    running = models.BooleanField(default=False)
+    period = models.PositiveIntegerField(default=30)  # seconds between draws
+    next_draw_at = models.DateTimeField(null=True, blank=True)
+    last_draw_at = models.DateTimeField(null=True, blank=True)
+    last_validate_ms = models.FloatField(null=True, blank=True)
+    last_error = models.CharField(blank=True, max_length=200)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # last daemon poll
+
+    objects = AutoDrawScheduleManager()
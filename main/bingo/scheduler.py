@@ -0,0 +1,120 @@
+# main/bingo/scheduler.py
+import datetime
+import logging
+from typing import Optional
+
+from django.utils import timezone
+
+from . import draws
+from .models import AutoDrawSchedule, GameCounter
+
+lg = logging.getLogger("django")
+
+MIN_PERIOD = 5  # seconds
+# the daemon counts as alive while its last poll is at most this old
+HEARTBEAT_TIMEOUT = datetime.timedelta(seconds=10)
+
+
+def validate_period(period) -> int:
+    try:
+        period = int(period)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid period {period!r}")
+    if period < MIN_PERIOD:
+        raise ValueError(f"period must be at least {MIN_PERIOD} seconds")
+    return period
+
+
+def start(period: Optional[int] = None) -> AutoDrawSchedule:
+    """Starts auto-drawing, the first draw being one period from now."""
+    schedule = AutoDrawSchedule.objects.load()
+    if period is not None:
+        schedule.period = validate_period(period)
+    schedule.running = True
+    schedule.next_draw_at = timezone.now() + datetime.timedelta(seconds=schedule.period)
+    schedule.last_error = ""
+    schedule.save()
+    lg.info(f"auto-draw started every {schedule.period}s")
+    return schedule
+
+
+def pause() -> AutoDrawSchedule:
+    schedule = AutoDrawSchedule.objects.load()
+    schedule.running = False
+    schedule.next_draw_at = None
+    schedule.save()
+    lg.info("auto-draw paused")
+    return schedule
+
+
+def set_period(period: int) -> AutoDrawSchedule:
+    """Changes the period; a running schedule keeps its last draw as anchor."""
+    schedule = AutoDrawSchedule.objects.load()
+    schedule.period = validate_period(period)
+    if schedule.running:
+        anchor = schedule.last_draw_at or timezone.now()
+        schedule.next_draw_at = max(
+            anchor + datetime.timedelta(seconds=schedule.period), timezone.now()
+        )
+    schedule.save()
+    return schedule
+
+
+def status(now: Optional[datetime.datetime] = None) -> dict:
+    now = now or timezone.now()
+    schedule = AutoDrawSchedule.objects.load()
+    seconds_to_next = None
+    if schedule.running and schedule.next_draw_at:
+        seconds_to_next = max((schedule.next_draw_at - now).total_seconds(), 0)
+    return {
+        "running": schedule.running,
+        "period": schedule.period,
+        "next_draw_at": schedule.next_draw_at,
+        "seconds_to_next": seconds_to_next,
+        "last_draw_at": schedule.last_draw_at,
+        "last_validate_ms": schedule.last_validate_ms,
+        "last_error": schedule.last_error,
+        "daemon_alive": schedule.heartbeat_at is not None
+        and now - schedule.heartbeat_at <= HEARTBEAT_TIMEOUT,
+        "draw_seq": GameCounter.objects.current_seq(),
+    }
+
+
+def run_due(now: Optional[datetime.datetime] = None) -> Optional[draws.DrawResult]:
+    """Draws once if the schedule is due; called by the `autodraw` daemon.
+
+    The slot is claimed with a conditional UPDATE before drawing, so a pause
+    or period change made meanwhile wins and a second daemon never draws the
+    same slot. Slots missed while nothing was polling are skipped rather
+    than drawn in a burst.
+    """
+    now = now or timezone.now()
+    AutoDrawSchedule.objects.filter(pk=1).update(heartbeat_at=now)
+    schedule = AutoDrawSchedule.objects.load()
+    if not schedule.running or schedule.next_draw_at is None:
+        return None
+    if schedule.next_draw_at > now:
+        return None
+
+    period = datetime.timedelta(seconds=schedule.period)
+    next_draw_at = schedule.next_draw_at + period
+    if next_draw_at <= now:
+        next_draw_at = now + period
+    claimed = AutoDrawSchedule.objects.filter(
+        pk=1, running=True, next_draw_at=schedule.next_draw_at
+    ).update(next_draw_at=next_draw_at)
+    if not claimed:
+        return None
+
+    try:
+        result = draws.draw(expected_seq=GameCounter.objects.current_seq())
+    except draws.OutOfNumbers as e:
+        lg.warning(f"auto-draw paused: {e}")
+        AutoDrawSchedule.objects.filter(pk=1).update(
+            running=False, next_draw_at=None, last_error=str(e)
+        )
+        return None
+    AutoDrawSchedule.objects.filter(pk=1).update(
+        last_draw_at=now, last_validate_ms=result.validate_ms, last_error=""
+    )
+    return result
@@ -0,0 +1,12 @@
+# main/bingo/signals.py
+from .models import GameCounter
+
+
+def player_saved(sender, instance, created, **kwargs) -> None:
+    # the cached game state counts players
+    if created:
+        GameCounter.objects.bump()
+
+
+def player_deleted(sender, instance, **kwargs) -> None:
+    GameCounter.objects.bump()
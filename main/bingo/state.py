@@ -0,0 +1,110 @@
+# main/bingo/state.py
+import logging
+import threading
+from collections import deque
+from typing import NamedTuple, Optional
+
+from accounts.models import CustomUser
+
+from .broker import PROJECTOR_NUMBERS
+from django.db.models import Q
+
+from .models import BingoWinner, GameCounter, winningNumber
+
+lg = logging.getLogger("django")
+
+
+class GameState(NamedTuple):
+    """Read-only snapshot of the current game shared by the bingo views."""
+
+    version: int
+    game: int  # incremented by every reset, see GameCounter
+    draw_seq: int  # sequence of the latest draw
+    numbers: tuple[int, ...]  # drawn numbers in drawing order
+    recent: deque  # ring buffer of the last `PROJECTOR_NUMBERS` numbers
+    last_draw_id: int  # id of the latest winningNumber, 0 before the first draw
+    winners: tuple[BingoWinner, ...]  # in winning order
+    num_players: int
+
+    @property
+    def num_drawn(self) -> int:
+        return len(self.numbers)
+
+    @property
+    def latest(self) -> list[int]:
+        """Most recently drawn numbers, newest first."""
+        return list(reversed(self.recent))
+
+    @property
+    def winner_ids(self) -> list[int]:
+        return [winner.board_id for winner in self.winners]
+
+
+_state: Optional[GameState] = None
+_state_lock = threading.Lock()
+
+
+def load_state(version: int, game: int, draw_seq: int) -> GameState:
+    # bounded by `draw_seq` so a draw committed since the counter was read is
+    # left to the next refresh instead of being counted twice
+    draws = list(
+        winningNumber.objects.filter(Q(seq__lte=draw_seq) | Q(seq__isnull=True))
+        .order_by("seq", "id")
+        .values_list("id", "num")
+    )
+    numbers = tuple(num for _, num in draws)
+    return GameState(
+        version=version,
+        game=game,
+        draw_seq=draw_seq,
+        numbers=numbers,
+        recent=deque(numbers, maxlen=PROJECTOR_NUMBERS),
+        last_draw_id=max((draw_id for draw_id, _ in draws), default=0),
+        winners=tuple(BingoWinner.objects.all()),
+        num_players=CustomUser.objects.count(),
+    )
+
+
+def refresh_state(state: GameState, version: int, draw_seq: int) -> GameState:
+    """Brings `state` up to date within the same game, reading only the draws
+    in `(state.draw_seq, draw_seq]` (a range scan of the seq index)."""
+    draws = list(
+        winningNumber.objects.filter(seq__gt=state.draw_seq, seq__lte=draw_seq)
+        .order_by("seq")
+        .values_list("id", "num")
+    )
+    recent = deque(state.recent, maxlen=PROJECTOR_NUMBERS)
+    recent.extend(num for _, num in draws)
+    return state._replace(
+        version=version,
+        draw_seq=draw_seq,
+        numbers=state.numbers + tuple(num for _, num in draws),
+        recent=recent,
+        last_draw_id=max((draw_id for draw_id, _ in draws), default=state.last_draw_id),
+        winners=tuple(BingoWinner.objects.all()),
+        num_players=CustomUser.objects.count(),
+    )
+
+
+def get_state() -> GameState:
+    """Returns this worker's cached game state.
+
+    Costs one tiny query on the `GameCounter` row per call; the state is
+    only refreshed when a draw, a reset or a player change bumped its version,
+    and fully reloaded only when a reset started a new game.
+    """
+    global _state
+    version, game, draw_seq = GameCounter.objects.current()
+    with _state_lock:
+        if _state is None or _state.game != game or _state.draw_seq > draw_seq:
+            lg.debug(f"reloading bingo game state for {version=}")
+            _state = load_state(version, game, draw_seq)
+        elif _state.version != version:
+            _state = refresh_state(_state, version, draw_seq)
+        return _state
+
+
+def invalidate_state() -> None:
+    global _state
+    with _state_lock:
+        _state = None
@@ -0,0 +1,86 @@
+# main/bingo/storage.py
+"""Compact binary encoding of bingo boards.
+
+A board is stored as a 2 byte header (dims, bytes per number) followed by
+the numbers row by row as little-endian uint8 or uint16. The marked state is
+a bitmask integer where bit `row * dims + col` is set for a drawn cell,
+stored as the minimum number of little-endian bytes. A board has won when
+all bits of one of its `line_masks` are set.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+HEADER_SIZE = 2
+DTYPES = {1: np.dtype("<u1"), 2: np.dtype("<u2")}
+
+
+def pack_grid(grid) -> bytes:
+    grid = np.asarray(grid)
+    dims = len(grid)
+    if grid.shape != (dims, dims):
+        raise ValueError(f"board must be square, got shape {grid.shape}")
+    if grid.size and (grid.min() < 0 or grid.max() > 0xFFFF):
+        raise ValueError("board numbers must be within 0-65535")
+    itemsize = 1 if not grid.size or grid.max() <= 0xFF else 2
+    return bytes([dims, itemsize]) + grid.astype(DTYPES[itemsize]).tobytes()
+
+
+def unpack_grid(data: bytes) -> np.ndarray:
+    """Read-only (dims, dims) view over the packed board bytes."""
+    data = bytes(data)
+    dims, itemsize = data[0], data[1]
+    return np.frombuffer(data, dtype=DTYPES[itemsize], offset=HEADER_SIZE).reshape(
+        dims, dims
+    )
+
+
+def mask_size(dims: int) -> int:
+    return (dims * dims + 7) // 8
+
+
+def pack_mask(mask: int, dims: int) -> bytes:
+    return mask.to_bytes(mask_size(dims), "little")
+
+
+def unpack_mask(data) -> int:
+    return int.from_bytes(bytes(data), "little") if data else 0
+
+
+def mask_from_marked(marked) -> int:
+    """Bitmask of a (dims, dims) boolean array."""
+    bits = np.packbits(np.asarray(marked, dtype=bool).ravel(), bitorder="little")
+    return int.from_bytes(bits.tobytes(), "little")
+
+
+def marked_from_mask(mask: int, dims: int) -> np.ndarray:
+    bits = np.frombuffer(pack_mask(mask, dims), dtype=np.uint8)
+    return (
+        np.unpackbits(bits, bitorder="little")[: dims * dims]
+        .reshape(dims, dims)
+        .astype(bool)
+    )
+
+
+@lru_cache(maxsize=None)
+def line_masks(dims: int) -> tuple[int, ...]:
+    """Bitmasks of every row, every column and both diagonals of a board."""
+    rows = [((1 << dims) - 1) << (r * dims) for r in range(dims)]
+    cols = [sum(1 << (r * dims + c) for r in range(dims)) for c in range(dims)]
+    diag = sum(1 << (i * dims + i) for i in range(dims))
+    anti = sum(1 << (i * dims + dims - 1 - i) for i in range(dims))
+    return tuple(rows + cols + [diag, anti])
+
+
+@lru_cache(maxsize=None)
+def cell_line_masks(dims: int) -> tuple[tuple[int, ...], ...]:
+    """For every cell index, the line masks passing through that cell."""
+    return tuple(
+        tuple(m for m in line_masks(dims) if m >> cell & 1)
+        for cell in range(dims * dims)
+    )
+
+
+def is_winning_mask(mask: int, dims: int) -> bool:
+    return any((mask & m) == m for m in line_masks(dims))
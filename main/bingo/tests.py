@@ -1,3 +1,865 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import CustomUser
+
+from bingo import (
+    batch,
+    broker,
+    draws,
+    engine,
+    scheduler,
+    state,
+    storage,
+    views,
+)
+from bingo.broker import PROJECTOR_NUMBERS
+from bingo.management.commands import autodraw
+from bingo.models import (
+    AutoDrawSchedule,
+    BingoBoard,
+    BingoSettings,
+    BingoWinner,
+    DrawPool,
+    GameCounter,
+    winningNumber,
+)
+
+
+def create_players(count: int, first: int = 0) -> list[CustomUser]:
+    return CustomUser.objects.bulk_create(
+        CustomUser(username=f"p{i}", email=f"p{i}@example.com")
+        for i in range(first, first + count)
+    )
+
+
+def expected_states(boards, winning_numbers) -> dict[int, tuple[bool, int]]:
+    """(is_winner, marked mask) of each board according to `validate_board`."""
+    states = {}
+    for board in boards:
+        board.validate_board(list(winning_numbers))
+        states[board.pk] = (board.is_winner, board.marked_mask)
+    return states
+
+
+def stored_states() -> dict[int, tuple[bool, int]]:
+    return {
+        board.pk: (board.is_winner, board.marked_mask)
+        for board in BingoBoard.objects.all()
+    }
+
+
+class BingoTestCase(TestCase):
+    """Clears the per-process caches, which outlive each test's transaction."""
+
+    def setUp(self):
+        BingoSettings.invalidate_cache()
+        engine.reset_engine()
+        state.invalidate_state()
+        self.addCleanup(BingoSettings.invalidate_cache)
+        self.addCleanup(engine.reset_engine)
+        self.addCleanup(state.invalidate_state)
+
+
+class DrawPipelineTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=20, dims=3)
+
+    def test_draws_are_sequenced_and_unique(self):
+        results = [draws.draw() for _ in range(20)]
+        self.assertEqual([r.seq for r in results], list(range(1, 21)))
+        self.assertEqual(
+            sorted(winningNumber.objects.values_list("num", flat=True)),
+            list(range(1, 21)),
+        )
+        with self.assertRaises(draws.OutOfNumbers):
+            draws.draw()
+        # the failed draw did not consume a sequence
+        self.assertEqual(GameCounter.objects.current_seq(), 20)
+
+    def test_outdated_expected_seq_is_coalesced(self):
+        first = draws.draw(expected_seq=0)
+        self.assertTrue(first.drawn)
+        second = draws.draw(expected_seq=0)
+        self.assertEqual(second, draws.DrawResult(None, 1, False))
+        self.assertEqual(winningNumber.objects.count(), 1)
+
+    def test_legacy_draws_are_backfilled(self):
+        winningNumber.objects.create(num=20)
+        winningNumber.objects.create(num=19)
+        GameCounter.objects.all().delete()
+        self.assertEqual(draws.draw().seq, 3)
+        self.assertEqual(
+            list(winningNumber.objects.order_by("id").values_list("seq", flat=True)),
+            [1, 2, 3],
+        )
+
+    def test_legacy_draws_are_backfilled_on_player_change(self):
+        winningNumber.objects.create(num=20)
+        winningNumber.objects.create(num=19)
+        GameCounter.objects.all().delete()
+        # the first sign-up after the upgrade creates the counter row
+        CustomUser.objects.create(username="new", email="new@example.com")
+        self.assertEqual(GameCounter.objects.current_seq(), 2)
+        self.assertEqual(draws.draw().seq, 3)
+        self.assertEqual(
+            list(winningNumber.objects.order_by("id").values_list("seq", flat=True)),
+            [1, 2, 3],
+        )
+
+
+class ConcurrentDrawTest(TransactionTestCase):
+    def setUp(self):
+        BingoSettings.invalidate_cache()
+        engine.reset_engine()
+        self.addCleanup(BingoSettings.invalidate_cache)
+        self.addCleanup(engine.reset_engine)
+
+    def test_concurrent_clicks_draw_once(self):
+        BingoSettings.objects.create(start_num=1, end_num=20, dims=3)
+        barrier = threading.Barrier(4)
+        results = []
+
+        def click():
+            barrier.wait()
+            results.append(draws.draw(expected_seq=0))
+
+        threads = [threading.Thread(target=click) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(r.drawn for r in results), 1)
+        self.assertEqual(winningNumber.objects.count(), 1)
+
+
+class GameStateTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=20, dims=3)
+
+    def test_cached_until_version_changes(self):
+        first = state.get_state()
+        with self.assertNumQueries(1):
+            self.assertIs(state.get_state(), first)
+
+        result = draws.draw()
+        current = state.get_state()
+        self.assertEqual(current.numbers, (result.num,))
+        self.assertEqual(current.draw_seq, 1)
+        self.assertEqual(current.latest, [result.num])
+
+        CustomUser.objects.create(username="new", email="new@example.com")
+        self.assertEqual(state.get_state().num_players, current.num_players + 1)
+
+    def test_projector_ring_buffer(self):
+        nums = [draws.draw().num for _ in range(10)]
+        current = state.get_state()
+        self.assertEqual(current.numbers, tuple(nums))
+        self.assertEqual(current.latest, nums[::-1][:PROJECTOR_NUMBERS])
+        self.assertEqual(broker.latest_numbers(), current.latest)
+
+        # a draw committed right after the counter read waits for the next
+        # refresh instead of being appended twice
+        nums.append(draws.draw().num)
+        drawn, patch = self.draw_after_counter_read()
+        with patch:
+            self.assertEqual(state.get_state().numbers, tuple(nums))
+        nums.extend(drawn)
+        current = state.get_state()
+        self.assertEqual(current.numbers, tuple(nums))
+        self.assertEqual(current.latest, nums[::-1][:PROJECTOR_NUMBERS])
+
+        # a fresh load and the incremental refresh agree
+        state.invalidate_state()
+        self.assertEqual(state.get_state().latest, current.latest)
+
+    def draw_after_counter_read(self):
+        """Patches the counter read so that a draw commits right after it."""
+        current = GameCounter.objects.current
+
+        def read_then_draw():
+            row = current()
+            if not drawn:
+                drawn.append(draws.draw().num)
+            return row
+
+        drawn = []
+        return drawn, mock.patch.object(
+            GameCounter.objects, "current", side_effect=read_then_draw
+        )
+
+    def test_load_ignores_draws_after_counter(self):
+        first = draws.draw().num
+        drawn, patch = self.draw_after_counter_read()
+        with patch:
+            current = state.get_state()
+        self.assertEqual((current.draw_seq, current.numbers), (1, (first,)))
+        # the next refresh picks the draw up exactly once
+        self.assertEqual(state.get_state().numbers, (first, drawn[0]))
+
+    def test_reset_reloads_state(self):
+        draws.draw()
+        self.assertEqual(state.get_state().num_drawn, 1)
+        BingoBoard.objects.reset_for_players([])
+        draws.draw()
+        current = state.get_state()
+        self.assertEqual(current.draw_seq, 1)
+        self.assertEqual(current.num_drawn, 1)
+        self.assertEqual(len(current.latest), 1)
+
+
+class DrawWatcherTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=20, dims=3)
+
+    def test_publishes_changes_of_other_processes(self):
+        check = broker.DrawWatcher.check
+        with mock.patch.object(broker.broker, "publish") as publish:
+            # (re)starting publishes the current state
+            seen = check(None)
+            publish.assert_called_once_with(broker.draw_event(0, []))
+            publish.reset_mock()
+            self.assertEqual(check(seen), seen)
+            publish.assert_not_called()
+
+            nums = [draws.draw().num for _ in range(2)]
+            publish.reset_mock()
+            seen = check(seen)
+            publish.assert_called_once_with(broker.draw_event(2, nums[::-1]))
+
+            BingoBoard.objects.reset_for_players([])
+            publish.reset_mock()
+            seen = check(seen)
+            publish.assert_called_once_with(broker.draw_event(0, [], kind="reset"))
+
+    def test_repeated_event_is_dropped(self):
+        draw_broker = broker.DrawBroker()
+        event = broker.draw_event(1, [7])
+        with mock.patch.object(draw_broker, "_subscribers", {(mock.Mock(), None)}):
+            draw_broker.publish(event)
+            draw_broker.publish(dict(event))
+            draw_broker.publish(broker.draw_event(2, [3, 7]))
+            ((loop, _),) = draw_broker._subscribers
+        self.assertEqual(loop.call_soon_threadsafe.call_count, 2)
+
+
+class AutoDrawTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=20, dims=3)
+
+    def test_draws_when_due(self):
+        schedule = scheduler.start(10)
+        self.assertIsNone(scheduler.run_due())
+
+        due = schedule.next_draw_at
+        result = scheduler.run_due(now=due)
+        self.assertTrue(result.drawn)
+        self.assertEqual(result.seq, 1)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.next_draw_at, due + datetime.timedelta(seconds=10))
+        self.assertEqual(schedule.last_validate_ms, result.validate_ms)
+        # the slot is claimed, so a second poll does not draw again
+        self.assertIsNone(scheduler.run_due(now=due))
+
+        # missed slots are skipped instead of drawn in a burst
+        late = due + datetime.timedelta(seconds=95)
+        self.assertEqual(scheduler.run_due(now=late).seq, 2)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.next_draw_at, late + datetime.timedelta(seconds=10))
+
+        scheduler.pause()
+        self.assertIsNone(scheduler.run_due(now=late + datetime.timedelta(hours=1)))
+        self.assertEqual(GameCounter.objects.current_seq(), 2)
+
+    def test_daemon_survives_errors(self):
+        scheduler.start(10)
+        command = autodraw.Command(stdout=io.StringIO())
+        command.poll = 1.0
+        error = OperationalError("database is locked")
+        with mock.patch.object(scheduler, "run_due", side_effect=error):
+            with self.assertLogs("django", "ERROR"):
+                self.assertEqual(command.tick(), 1.0)
+        self.assertEqual(
+            scheduler.status()["last_error"], "OperationalError: database is locked"
+        )
+        self.assertTrue(scheduler.status()["running"])
+
+    def test_gm_page_requires_gamemaster(self):
+        url = "/bingo/gmview"
+        draw = {"draw": True, "expected_seq": 0}
+        self.assertEqual(self.client.get(url).status_code, 302)
+        response = self.client.post(url, draw, content_type="application/json")
+        self.assertEqual(response.status_code, 302)
+
+        player = create_players(1)[0]
+        self.client.force_login(player)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.post(url, draw, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(GameCounter.objects.current_seq(), 0)
+
+        player.user_permissions.add(Permission.objects.get(codename="is_gamemaster"))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, draw, content_type="application/json")
+        self.assertTrue(response.json()["drawn"])
+
+    def test_api(self):
+        url = "/bingo/gmview/autodraw"
+        player = create_players(1)[0]
+        self.client.force_login(player)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.post(
+            url, {"action": "start"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(AutoDrawSchedule.objects.load().running)
+
+        player.user_permissions.add(Permission.objects.get(codename="is_gamemaster"))
+        response = self.client.post(
+            url, {"action": "start", "period": 20}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["running"])
+        self.assertEqual(response.json()["period"], 20)
+
+        response = self.client.post(url, {"period": 1}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        self.client.post(url, {"action": "pause"}, content_type="application/json")
+        status = self.client.get(url).json()
+        self.assertFalse(status["running"])
+        self.assertIsNone(status["seconds_to_next"])
+
+
+class WinnerEngineTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=30, dims=3)
+        BingoBoard.objects.reset_for_players(create_players(40), seed=1)
+
+    def drawn(self) -> list[int]:
+        return list(winningNumber.objects.order_by("seq").values_list("num", flat=True))
+
+    def test_engine_matches_validate_board(self):
+        for _ in range(12):
+            draws.draw()
+            self.assertEqual(
+                stored_states(),
+                expected_states(BingoBoard.objects.all(), self.drawn()),
+            )
+        # seed 1 produces winners within 12 draws, so wins are really checked
+        self.assertTrue(BingoBoard.objects.filter(is_winner=True).exists())
+
+    def test_rebuilds_when_boards_change(self):
+        for _ in range(5):
+            draws.draw()
+        before = engine._engine.signature
+
+        # a sign-up adds a board, with the numbers drawn so far marked
+        board = BingoBoard(owner=create_players(1, first=100)[0])
+        board.generateBoard()
+        board.save()
+        draws.draw()
+        self.assertNotEqual(engine._engine.signature, before)
+        self.assertIn(board.pk, engine._engine.board_ids)
+        self.assertEqual(
+            stored_states(), expected_states(BingoBoard.objects.all(), self.drawn())
+        )
+
+        # a reset replaces every board and clears the drawn numbers
+        BingoBoard.objects.reset_for_players(CustomUser.objects.all(), seed=2)
+        draws.draw()
+        self.assertEqual(len(engine._engine.drawn), 1)
+        self.assertEqual(
+            stored_states(), expected_states(BingoBoard.objects.all(), self.drawn())
+        )
+
+    def test_catches_up_on_draws_of_other_processes(self):
+        draws.draw()
+        # another process draws two numbers without this process' engine
+        with transaction.atomic():
+            for _ in range(2):
+                draws.pop_next_number(GameCounter.objects.advance())
+        current, touched = engine.sync_engine(self.drawn())
+        engine.save_board_states(current, touched)
+        self.assertEqual(current.drawn, set(self.drawn()))
+        self.assertEqual(
+            stored_states(), expected_states(BingoBoard.objects.all(), self.drawn())
+        )
+
+    def test_legacy_json_board(self):
+        grid = [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+        legacy = BingoBoard.objects.create(
+            owner=create_players(1, first=100)[0], board=grid
+        )
+        for num in (1, 5, 9):
+            with transaction.atomic():
+                winningNumber.objects.create(num=num, seq=GameCounter.objects.advance())
+        current, touched = engine.sync_engine([1, 5, 9])
+        engine.save_board_states(current, touched)
+        legacy.refresh_from_db()
+        self.assertIsNone(legacy.cells)
+        self.assertTrue(legacy.is_winner)
+        self.assertEqual(
+            legacy.marked_mask, expected_states([legacy], [1, 5, 9])[legacy.pk][1]
+        )
+
+
+class BatchValidatorTest(SimpleTestCase):
+    def boards(self, dims: int, count: int, first_id: int) -> list[BingoBoard]:
+        grids = batch.generate_grids(count, 1, 30, dims, seed=dims)
+        boards = []
+        for i, grid in enumerate(grids, start=first_id):
+            board = BingoBoard(pk=i)
+            board.set_grid(grid)
+            boards.append(board)
+        return boards
+
+    def test_matches_validate_board_across_dims(self):
+        boards = self.boards(3, 30, 1) + self.boards(4, 30, 100)
+        numbers = list(np.random.default_rng(0).permutation(np.arange(1, 31)))
+        for drawn in range(1, 31, 3):
+            winning_numbers = numbers[:drawn]
+            results = batch.validate_boards(boards, winning_numbers)
+            self.assertEqual(sorted(len(r.board_ids) for r in results), [30, 30])
+            got = {}
+            for result in results:
+                for board_id, marked, is_winner in zip(*result):
+                    got[int(board_id)] = (
+                        bool(is_winner),
+                        storage.mask_from_marked(marked),
+                    )
+            self.assertEqual(got, expected_states(boards, winning_numbers))
+
+    def test_empty_inputs(self):
+        self.assertEqual(batch.validate_boards([], [1, 2, 3]), [])
+        (result,) = batch.validate_boards(self.boards(3, 5, 1), [])
+        self.assertFalse(result.marked.any())
+        self.assertEqual(result.winner_ids, [])
+        marked, is_winner = batch.validate_grids(np.zeros((0, 3, 3), np.int32), [1])
+        self.assertEqual(marked.shape, (0, 3, 3))
+        self.assertEqual(is_winner.shape, (0,))
+
+
+class ResetForPlayersTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=10, end_num=40, dims=4)
+        cls.players = create_players(25)
+
+    def grids(self) -> list[list]:
+        return [
+            board.grid.tolist() for board in BingoBoard.objects.order_by("owner_id")
+        ]
+
+    def test_one_board_per_player(self):
+        BingoBoard.objects.reset_for_players(self.players, seed=3)
+        boards = list(BingoBoard.objects.all())
+        self.assertEqual(
+            sorted(b.owner_id for b in boards), sorted(p.pk for p in self.players)
+        )
+        for board in boards:
+            numbers = board.grid.ravel().tolist()
+            self.assertEqual(board.dims, 4)
+            self.assertEqual(len(set(numbers)), 16)
+            self.assertTrue(all(10 <= n <= 40 for n in numbers))
+
+    def test_seed_is_reproducible(self):
+        BingoBoard.objects.reset_for_players(self.players, seed=3)
+        first = self.grids()
+        BingoBoard.objects.reset_for_players(self.players, seed=3)
+        self.assertEqual(self.grids(), first)
+        BingoBoard.objects.reset_for_players(self.players, seed=4)
+        self.assertNotEqual(self.grids(), first)
+
+    def test_clears_the_game(self):
+        BingoBoard.objects.reset_for_players(self.players, seed=3)
+        for _ in range(3):
+            draws.draw()
+        BingoBoard.objects.reset_for_players(self.players, seed=3)
+        self.assertFalse(winningNumber.objects.exists())
+        self.assertEqual(GameCounter.objects.current_seq(), 0)
+        self.assertEqual(
+            sorted(DrawPool.objects.values_list("num", flat=True)), list(range(10, 41))
+        )
+
+    def test_range_too_small(self):
+        with self.assertRaises(ValueError):
+            batch.generate_grids(2, 1, 15, 4)
+
+
+class DrawDeltaTest(BingoTestCase):
+    url = "/bingo/player/draws"
+
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=20, dims=3)
+        cls.player = create_players(1)[0]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.player)
+
+    def get(self, since: int, **kwargs):
+        return self.client.get(self.url, {"since": since}, **kwargs)
+
+    def test_not_modified(self):
+        self.assertEqual(self.get(0).status_code, 304)
+        draws.draw()
+        seq = winningNumber.objects.get().pk
+        self.assertEqual(self.get(seq).status_code, 304)
+        response = self.get(0, headers={"If-None-Match": f'"draws-{seq}"'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_delta_and_full(self):
+        first, second = draws.draw(), draws.draw()
+        ids = list(winningNumber.objects.order_by("id").values_list("id", flat=True))
+
+        data = self.get(0).json()
+        self.assertTrue(data["full"])
+        self.assertEqual(data["numbers"], [first.num, second.num])
+        self.assertEqual(data["seq"], ids[-1])
+
+        data = self.get(ids[0]).json()
+        self.assertFalse(data["full"])
+        self.assertEqual(data["numbers"], [second.num])
+        self.assertEqual(data["num_drawn"], 2)
+
+        # after a reset the client's seq belongs to the previous game
+        BingoBoard.objects.reset_for_players([])
+        third = draws.draw()
+        data = self.get(ids[-1]).json()
+        self.assertTrue(data["full"])
+        self.assertEqual(data["numbers"], [third.num])
+
+    def test_wait_ignored_under_wsgi(self):
+        start = time.monotonic()
+        response = self.client.get(self.url, {"since": 0, "wait": 20})
+        self.assertEqual(response.status_code, 304)
+        self.assertLess(time.monotonic() - start, 5)
+        # clients are told to poll slowly instead
+        self.assertEqual(
+            response["Retry-After"], str(views.DrawDeltaView.poll_interval)
+        )
+        draws.draw()
+        response = self.client.get(self.url, {"since": 0, "wait": 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Retry-After", response)
+        self.assertNotIn("Retry-After", self.get(0))
+
+    def test_draw_after_state_read_is_not_returned(self):
+        first = draws.draw()
+        stale = {"seq": winningNumber.objects.get().pk, "first": None, "num_drawn": 1}
+        draws.draw()  # lands between draw_state() and the numbers query
+
+        async def draw_state():
+            return dict(stale, first=stale["seq"])
+
+        with mock.patch.object(
+            views.DrawDeltaView, "draw_state", staticmethod(draw_state)
+        ):
+            data = self.get(0).json()
+        self.assertEqual(data["seq"], stale["seq"])
+        self.assertEqual(data["numbers"], [first.num])
+
+
+class DrawEventsTest(BingoTestCase):
+    url = "/bingo/winningnumbers/events"
+
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=20, dims=3)
+        cls.player = create_players(1)[0]
+
+    def test_login_required(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_refused_under_wsgi(self):
+        self.client.force_login(self.player)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    async def test_stream(self):
+        await self.async_client.aforce_login(self.player)
+        # draws of this process are published directly, no watcher thread
+        with mock.patch.object(broker.watcher, "ensure_started"):
+            response = await self.async_client.get(self.url)
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            stream = aiter(response.streaming_content)
+            self.assertEqual(await anext(stream), b"retry: 2000\n\n")
+            self.assertEqual(
+                await anext(stream),
+                views.DrawEventsView.format_event(broker.draw_event(0, [])).encode(),
+            )
+            result = await sync_to_async(draws.draw)()
+            self.assertEqual(
+                await anext(stream),
+                views.DrawEventsView.format_event(
+                    broker.draw_event(1, [result.num])
+                ).encode(),
+            )
+            await stream.aclose()
+
+
+class DrawPoolTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=5, end_num=14, dims=3)
+
+    def test_exhausts_the_range_exactly(self):
+        nums = [draws.draw().num for _ in range(10)]
+        self.assertEqual(sorted(nums), list(range(5, 15)))
+        self.assertFalse(DrawPool.objects.exists())
+        with self.assertRaises(draws.OutOfNumbers):
+            draws.draw()
+        self.assertNotIn(15, winningNumber.objects.values_list("num", flat=True))
+
+    def test_lazy_refill_skips_drawn_numbers(self):
+        for seq, num in enumerate((5, 9, 14), start=1):
+            winningNumber.objects.create(num=num, seq=seq)
+        GameCounter.objects.create(pk=1, draw_seq=3, version=1)
+        self.assertFalse(DrawPool.objects.exists())
+
+        nums = [draws.draw().num for _ in range(7)]
+        self.assertEqual(sorted(nums), [6, 7, 8, 10, 11, 12, 13])
+        with self.assertRaises(draws.OutOfNumbers):
+            draws.draw()
+
+    def test_settings_change_refills_the_pool(self):
+        drawn = draws.draw().num
+        self.client.post(
+            "/bingo/settings",
+            {"change": "1", "start_num": "5", "end_num": "20", "dims": ""},
+        )
+        self.assertEqual(BingoSettings.load().end_num, 20)
+        self.assertEqual(
+            sorted(DrawPool.objects.values_list("num", flat=True)),
+            [n for n in range(5, 21) if n != drawn],
+        )
+
+
+class SettingsCacheTest(BingoTestCase):
+    def test_cached_within_ttl(self):
+        settings = BingoSettings.objects.create(dims=5)
+        self.assertEqual(BingoSettings.load(), settings)
+        with self.assertNumQueries(0):
+            self.assertIs(BingoSettings.load(), BingoSettings.load())
+
+    def test_save_invalidates(self):
+        settings = BingoSettings.objects.create(dims=5)
+        self.assertEqual(BingoSettings.load().dims, 5)
+        settings.dims = 4
+        settings.save()
+        self.assertEqual(BingoSettings.load().dims, 4)
+
+    def test_replaced_row_with_same_version(self):
+        BingoSettings.objects.create(dims=5)
+        cached = BingoSettings.load()
+        # another worker deletes and recreates the row, which this worker's
+        # save() based invalidation does not see
+        BingoSettings.objects.all().delete()
+        BingoSettings.objects.bulk_create(
+            [BingoSettings(dims=4, version=cached.version)]
+        )
+        with mock.patch.object(BingoSettings, "cache_ttl", 0):
+            self.assertEqual(BingoSettings.load().dims, 4)
+
+
+class StorageTest(SimpleTestCase):
+    def test_grid_round_trip(self):
+        small = np.arange(1, 50).reshape(7, 7)
+        packed = storage.pack_grid(small)
+        self.assertEqual(len(packed), storage.HEADER_SIZE + 49)
+        np.testing.assert_array_equal(storage.unpack_grid(packed), small)
+
+        large = np.array([[1, 300], [65535, 256]])
+        packed = storage.pack_grid(large)
+        self.assertEqual(packed[:2], bytes([2, 2]))
+        self.assertEqual(len(packed), storage.HEADER_SIZE + 8)
+        np.testing.assert_array_equal(storage.unpack_grid(packed), large)
+
+    def test_invalid_grids(self):
+        for grid in ([[1, 65536], [2, 3]], [[-1, 2], [3, 4]], [[1, 2, 3], [4, 5, 6]]):
+            with self.subTest(grid=grid), self.assertRaises(ValueError):
+                storage.pack_grid(grid)
+
+    def test_mask_round_trip(self):
+        for dims, mask in ((3, 0b101010101), (7, (1 << 49) - 1), (5, 1 << 24)):
+            packed = storage.pack_mask(mask, dims)
+            self.assertEqual(len(packed), storage.mask_size(dims))
+            self.assertEqual(storage.unpack_mask(packed), mask)
+            marked = storage.marked_from_mask(mask, dims)
+            self.assertEqual(storage.mask_from_marked(marked), mask)
+        self.assertEqual(storage.unpack_mask(None), 0)
+        self.assertEqual(storage.unpack_mask(b""), 0)
+
+
+class PackBoardsTest(BingoTestCase):
+    def test_converts_legacy_boards(self):
+        grid = [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+        legacy = BingoBoard.objects.create(board=grid)
+        packed = BingoBoard(owner=create_players(1)[0])
+        packed.set_grid([[9, 8, 7], [6, 5, 4], [3, 2, 1]])
+        packed.save()
+        for seq, num in enumerate((1, 5, 9), start=1):
+            winningNumber.objects.create(num=num, seq=seq)
+
+        call_command("pack_boards", stdout=io.StringIO())
+        legacy.refresh_from_db()
+        self.assertIsNone(legacy.board)
+        self.assertEqual(legacy.grid.tolist(), grid)
+        self.assertEqual(legacy.marked_mask, 0b100010001)
+        self.assertEqual(
+            BingoBoard.objects.get(pk=packed.pk).cells, bytes(packed.cells)
+        )
+
+
+class DedupeDrawsTest(BingoTestCase):
+    def test_keeps_distinct_draws(self):
+        for seq, num in enumerate((4, 2, 9), start=1):
+            winningNumber.objects.create(num=num, seq=seq)
+        out = io.StringIO()
+        call_command("dedupe_draws", stdout=out)
+        self.assertIn("0 duplicate draws deleted", out.getvalue())
+        self.assertEqual(
+            list(winningNumber.objects.order_by("seq").values_list("num", flat=True)),
+            [4, 2, 9],
+        )
+
+
+class LineMaskTest(SimpleTestCase):
+    def lines(self, dims: int) -> dict[str, list[tuple[int, int]]]:
+        return {
+            "row": [(1, c) for c in range(dims)],
+            "column": [(r, dims - 1) for r in range(dims)],
+            "diagonal": [(i, i) for i in range(dims)],
+            "anti-diagonal": [(i, dims - 1 - i) for i in range(dims)],
+        }
+
+    def test_line_masks(self):
+        for dims in (3, 4, 5, 7):
+            masks = storage.line_masks(dims)
+            self.assertEqual(len(masks), 2 * dims + 2)
+            for name, cells in self.lines(dims).items():
+                mask = sum(1 << (r * dims + c) for r, c in cells)
+                with self.subTest(dims=dims, line=name):
+                    self.assertIn(mask, masks)
+            for cell, cell_masks in enumerate(storage.cell_line_masks(dims)):
+                self.assertEqual(set(cell_masks), {m for m in masks if m >> cell & 1})
+        # the centre of an odd board lies on its row, column and both diagonals
+        self.assertEqual(len(storage.cell_line_masks(5)[12]), 4)
+
+    def test_validate_board(self):
+        for dims in (3, 4, 5, 7):
+            grid = np.arange(1, dims * dims + 1).reshape(dims, dims)
+            board = BingoBoard()
+            board.set_grid(grid)
+            for name, cells in self.lines(dims).items():
+                numbers = [int(grid[r, c]) for r, c in cells]
+                with self.subTest(dims=dims, line=name):
+                    self.assertTrue(board.validate_board(numbers).is_winner)
+                    self.assertEqual(board.marked.sum(), dims)
+                    # one cell short of the line
+                    self.assertFalse(board.validate_board(numbers[1:]).is_winner)
+                    self.assertFalse(board.validate_board(numbers[:-1]).is_winner)
+
+
+class SaveBoardStatesTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=30, dims=3)
+        BingoBoard.objects.reset_for_players(create_players(20), seed=5)
+
+    def test_writes_only_changed_boards_and_columns(self):
+        current, _ = engine.sync_engine([])
+        engine.save_board_states(current, current.board_ids)
+
+        containing = [
+            b.pk for b in BingoBoard.objects.all() if 7 in b.grid.ravel().tolist()
+        ]
+        self.assertTrue(0 < len(containing) < 20)
+        current, touched = engine.sync_engine([7])
+        self.assertEqual(touched, set(containing))
+
+        with CaptureQueriesContext(connection) as queries:
+            written = engine.save_board_states(current, current.board_ids)
+        self.assertEqual(written, len(containing))
+        (update,) = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertIn('"is_winner"', update)
+        self.assertIn('"marked_bits"', update)
+        self.assertNotIn('"cells"', update)
+        self.assertNotIn('"owner_id"', update)
+        self.assertEqual(
+            stored_states(), expected_states(BingoBoard.objects.all(), [7])
+        )
+
+        # nothing changed since, so nothing is written
+        with self.assertNumQueries(0):
+            self.assertEqual(engine.save_board_states(current, current.board_ids), 0)
+
+
+class BingoWinnerTest(BingoTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BingoSettings.objects.create(start_num=1, end_num=30, dims=3)
+        BingoBoard.objects.reset_for_players(create_players(5), seed=1)
+
+    def test_record(self):
+        first, second, third = BingoBoard.objects.order_by("pk")[:3]
+        BingoWinner.objects.record([third.pk], draw_seq=4, num=17)
+        BingoWinner.objects.record([second.pk, first.pk], draw_seq=6, num=3)
+        # another worker re-detects a board which already won
+        BingoWinner.objects.record([third.pk], draw_seq=6, num=3)
+
+        # ordered by the draw they won at, so the first winner comes first
+        winners = [
+            (w.board_id, w.draw_seq, w.winning_number)
+            for w in BingoWinner.objects.all()
+        ]
+        self.assertEqual(len(winners), 3)
+        self.assertEqual(winners[0], (third.pk, 4, 17))
+        self.assertEqual(set(winners[1:]), {(second.pk, 6, 3), (first.pk, 6, 3)})
+        winners = list(BingoWinner.objects.all())
+        self.assertEqual(winners[0].username, third.owner.username)
+
+        BingoBoard.objects.reset_for_players(CustomUser.objects.all())
+        self.assertFalse(BingoWinner.objects.exists())
+
+    def test_draws_record_each_winner_once(self):
+        for _ in range(12):
+            result = draws.draw()
+            for board in BingoBoard.objects.filter(is_winner=True):
+                winner = BingoWinner.objects.get(board=board)
+                self.assertLessEqual(winner.draw_seq, result.seq)
+        self.assertTrue(BingoWinner.objects.exists())
+        self.assertEqual(
+            BingoWinner.objects.count(),
+            BingoBoard.objects.filter(is_winner=True).count(),
+        )
+        for winner in BingoWinner.objects.all():
+            drawn = winningNumber.objects.get(seq=winner.draw_seq).num
+            self.assertEqual(winner.winning_number, drawn)
+            board = BingoBoard.objects.get(pk=winner.board_id)
+            before = winningNumber.objects.filter(seq__lt=winner.draw_seq)
+            self.assertFalse(
+                board.validate_board(
+                    list(before.values_list("num", flat=True))
+                ).is_winner
+            )
@@ -7,12 +7,10 @@ app_name = "bingo"
 urlpatterns = [
     path("", views.HomeView.as_view(), name="home"),
     path("player", views.PlayerView.as_view(), name="player"),
+    path("player/draws", views.DrawDeltaView.as_view(), name="player_draws"),
     path("gmview", views.GameMasterView.as_view(), name="gmview"),
-    path(
-    'gmview/<int:period>/<str:toggle_state>/',
-    views.GameMasterView.as_view(),
-    name='game_master_with_params'
-    ),
+    path("gmview/autodraw", views.AutoDrawView.as_view(), name="autodraw"),
     path("settings", views.SettingsView.as_view(), name="settings"),
-    path("winningnumbers", views.WinningNumbersView.as_view(), name="winningnumbers")
+    path("winningnumbers", views.WinningNumbersView.as_view(), name="winningnumbers"),
+    path("winningnumbers/events", views.DrawEventsView.as_view(), name="draw_events"),
 ]
@@ -1,16 +1,41 @@
 # main/bingo/views.py
+import asyncio
 import json
 import logging
-import random
 
 from accounts import models as accounts_models
-from django.http import JsonResponse
+from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max, Min
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.views import View
 from django.views.generic.base import TemplateView
-from main.custom_mixin import LoginRequiredMixinNopassword
-
-from .models import BingoBoard, BingoSettings, winningNumber
+from main.custom_mixin import CustomLoginRequiredMixin, LoginRequiredMixinNopassword
+
+from . import draws, scheduler
+from .broker import (
+    PROJECTOR_NUMBERS,
+    draw_event,
+    publish_reset,
+    subscribe,
+)
+from .engine import reset_engine
+from .state import get_state
+from .models import (
+    AutoDrawSchedule,
+    BingoBoard,
+    BingoSettings,
+    DrawPool,
+    winningNumber,
+)
 
 lg = logging.getLogger("django")
 
@@ -24,39 +49,34 @@ class SettingsView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if not BingoSettings.objects.exists():
-            BingoSettings().save()
-
-        settings = BingoSettings.objects.all().first()
-        context["settings"] = settings
+        context["settings"] = BingoSettings.load()
 
         return context
 
     def post(self, request, *args, **kwargs):
-        print(self.request.POST)
+        lg.debug(f"settings update: {self.request.POST}")
         if "change" in request.POST:
-            if not BingoSettings.objects.exists():
-                BingoSettings().save()
-            settings = BingoSettings.objects.all().first()
+            settings = BingoSettings.objects.first() or BingoSettings()
 
             if self.request.POST.get("start_num").strip():
-                settings.start_num = self.request.POST.get("start_num").strip()
+                settings.start_num = int(self.request.POST.get("start_num").strip())
             if self.request.POST.get("end_num").strip():
-                settings.end_num = self.request.POST.get("end_num").strip()
+                settings.end_num = int(self.request.POST.get("end_num").strip())
             if self.request.POST.get("dims").strip():
-                settings.dims = self.request.POST.get("dims").strip()
+                settings.dims = int(self.request.POST.get("dims").strip())
 
             settings.save()
+            # the range may have changed, reshuffle what is left to draw
+            DrawPool.objects.refill(
+                settings, exclude=winningNumber.objects.values_list("num", flat=True)
+            )
 
         if "reset" in request.POST:
-            winningNumber.objects.all().delete()
-            BingoBoard.objects.all().delete()
-            all_players = accounts_models.CustomUser.objects.all()
-            for player in all_players:
-                board = BingoBoard()
-                board.generateBoard()
-                board.owner = player
-                board.save()
+            BingoBoard.objects.reset_for_players(
+                accounts_models.CustomUser.objects.only("pk")
+            )
+            reset_engine()
+            publish_reset()
 
         return redirect(reverse("bingo:settings"))
 
@@ -68,15 +88,103 @@ class PlayerView(LoginRequiredMixinNopassword, TemplateView):
         context = super().get_context_data(**kwargs)
         board = self.request.user.bingo_board
         context["board"] = board
-        context["dims"] = len(board.board)
-        context["dims_list"] = range(0, len(board.board))
-        context["winning_numbers"] = list(
-            winningNumber.objects.values_list("num", flat=True)
-        )
+        context["dims"] = board.dims
+        context["dims_list"] = range(0, board.dims)
+        context["board_numbers"] = board.grid.tolist()
+        state = get_state()
+        context["winning_numbers"] = list(state.numbers)
+        context["draw_seq"] = state.last_draw_id
         context["user"] = self.request.user
         return context
 
 
+class DrawDeltaView(View):
+    """JSON delta of drawn numbers for player boards.
+
+    `seq` is the id of the latest draw, which only ever increases (also across
+    resets). Clients send back the last `seq` they saw as `?since=` and get
+    `304 Not Modified` if nothing was drawn since, otherwise only the newer
+    numbers. `full` is set when the client's state belongs to an earlier game
+    and the whole list is returned instead. With `?wait=<seconds>` the request
+    is held open until the next draw or the timeout; under WSGI, where that
+    would hold a whole sync worker, `wait` is ignored and responses to it
+    carry `Retry-After: <poll_interval>` so clients poll slowly instead.
+    """
+
+    max_wait = 25
+    poll_interval = 20  # seconds
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({"error": "login required"}, status=401)
+        try:
+            since = int(request.GET.get("since", 0))
+            wait = min(float(request.GET.get("wait", 0)), self.max_wait)
+        except ValueError:
+            return JsonResponse({"error": "invalid since/wait"}, status=400)
+        retry_after = None
+        if wait > 0 and not isinstance(request, ASGIRequest):
+            wait, retry_after = 0, self.poll_interval
+
+        state = await self.draw_state()
+        if state["seq"] == since and wait > 0:
+            state = await self.wait_for_draw(since, wait)
+
+        etag = f'"draws-{state["seq"]}"'
+        if state["seq"] == since or request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            if retry_after:
+                response["Retry-After"] = retry_after
+            return response
+
+        full = since == 0 or state["first"] is None or since < state["first"]
+        # bounded by `seq`, so a draw landing after `draw_state()` is not
+        # returned under an older seq and then again on the next poll
+        numbers = winningNumber.objects.filter(id__lte=state["seq"]).order_by("id")
+        if not full:
+            numbers = numbers.filter(id__gt=since)
+        response = JsonResponse(
+            {
+                "seq": state["seq"],
+                "num_drawn": state["num_drawn"],
+                "full": full,
+                "numbers": [n async for n in numbers.values_list("num", flat=True)],
+            }
+        )
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        if retry_after:
+            response["Retry-After"] = retry_after
+        return response
+
+    @staticmethod
+    async def draw_state() -> dict:
+        state = await winningNumber.objects.aaggregate(
+            seq=Max("id"), first=Min("id"), num_drawn=Count("id")
+        )
+        state["seq"] = state["seq"] or 0
+        return state
+
+    async def wait_for_draw(self, since: int, timeout: float) -> dict:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        with subscribe() as queue:
+            # re-check after subscribing so a draw in between is not missed
+            state = await self.draw_state()
+            while state["seq"] == since:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                state = await self.draw_state()
+        return state
+
+
 class WinningNumbersView(LoginRequiredMixinNopassword, TemplateView):
     template_name = "bingo/projector.html"
 
@@ -84,11 +192,11 @@ class WinningNumbersView(LoginRequiredMixinNopassword, TemplateView):
         context = super().get_context_data(**kwargs)
 
         # Get the 7 latest winning numbers
-        latest_winning_numbers = winningNumber.objects.all()[:7]
+        latest_winning_numbers = get_state().latest
 
         # Put them into context as num1, num2, ..., num7
-        for i, winning_number_obj in enumerate(latest_winning_numbers):
-            context[f"num{i+1}"] = winning_number_obj.num
+        for i, num in enumerate(latest_winning_numbers):
+            context[f"num{i+1}"] = num
 
         # Optional: If you want to handle cases where there are less than 7 numbers
         # for i in range(len(latest_winning_numbers), 7):
@@ -99,99 +207,131 @@ class WinningNumbersView(LoginRequiredMixinNopassword, TemplateView):
         return context
 
 
-class GameMasterView(TemplateView):
-    template_name = "bingo/gmview.html"
+class DrawEventsView(View):
+    """Server-sent event stream of draws for the projector.
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # These are retrieved from URL parameters when a GET request comes in
-        context["period"] = kwargs.get("period", 30)  # Default to 10 if not in URL
-        context["toggle_state"] = kwargs.get("toggle_state", False)  # Default to False
-        context["winning_numbers"] = list(
-            winningNumber.objects.values_list("num", flat=True)
-        )
+    Needs an ASGI server (see main/asgi.py): each open stream is a coroutine
+    waiting on the in-process broker, so it costs nothing between draws.
+    Draws made by other processes reach the broker through `DrawWatcher`.
+    Under WSGI the stream would block a worker for good, so it is refused with
+    `204 No Content`, which stops EventSource from reconnecting; the
+    projector page then falls back to reloading itself.
+    """
 
-        winners = BingoBoard.objects.all().filter(is_winner=True)
-        context["winners"] = winners
-        context["num_winners"] = len(winners)
-        context["num_players"] = accounts_models.CustomUser.objects.all().count()
-        context["num_drawn"] = len(
-            list(winningNumber.objects.values_list("num", flat=True))
-        )
+    keep_alive = 15  # seconds
+    retry_ms = 2000
 
-        print(
-            f"GET Request - Period: {context['period']}, Toggle State: {context['toggle_state']}"
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(
+                request.get_full_path(), reverse("accounts:login_no_password")
+            )
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        response = StreamingHttpResponse(
+            self.stream(), content_type="text/event-stream"
         )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # disable proxy buffering (nginx)
+        return response
+
+    @staticmethod
+    def format_event(event: dict) -> str:
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    async def current_event(self) -> dict:
+        num_drawn = await winningNumber.objects.acount()
+        latest = [
+            num
+            async for num in winningNumber.objects.order_by("-seq").values_list(
+                "num", flat=True
+            )[:PROJECTOR_NUMBERS]
+        ]
+        return draw_event(num_drawn, latest)
+
+    async def stream(self):
+        yield f"retry: {self.retry_ms}\n\n"
+        with subscribe() as queue:
+            yield self.format_event(await self.current_event())
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.keep_alive)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield self.format_event(event)
+
+
+class GameMasterView(CustomLoginRequiredMixin, PermissionRequiredMixin, TemplateView):
+    template_name = "bingo/gmview.html"
+    permission_required = ["accounts.is_gamemaster"]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        schedule = AutoDrawSchedule.objects.load()
+        context["period"] = schedule.period
+        context["toggle_state"] = schedule.running
+        state = get_state()
+        context["winning_numbers"] = list(state.numbers)
+        context["winners"] = state.winners
+        context["num_winners"] = len(state.winners)
+        context["num_players"] = state.num_players
+        # sent back with draw requests so concurrent draws can be coalesced
+        context["draw_seq"] = state.draw_seq
+        context["num_drawn"] = state.num_drawn
         return context
 
-    # Handle POST requests from your JavaScript fetch
+    # Manual draws from the GM page; auto-draws are made by the `autodraw` daemon
     def post(self, request, *args, **kwargs):
         try:
-            # Parse the JSON body
             data = json.loads(request.body)
-            period = data.get("period")
-            toggle_state = data.get("toggle_state")
-            draw = data.get("draw")
-
-            if draw:
-                if not BingoSettings.objects.exists():
-                    BingoSettings().save()
-
-                settings = BingoSettings.objects.all().first()
-
-                if (
-                    winningNumber.objects.all().count()
-                    == settings.end_num + 1 - settings.start_num
-                ):
-                    return JsonResponse({"error": "out of numbers"}, status=500)
-
-                existing_winning_numbers = winningNumber.objects.values_list(
-                    "num", flat=True
-                )
-                new_winning_number = random.randint(
-                    settings.start_num, settings.end_num + 1
-                )  # Assuming Bingo numbers are 1-75
-
-                # Keep generating until we find a number that's not already a winner
-                while new_winning_number in existing_winning_numbers:
-                    new_winning_number = random.randint(
-                        settings.start_num, settings.end_num + 1
-                    )
-
-                new_winning_number_obj = winningNumber(num=new_winning_number)
-                new_winning_number_obj.save()
-
-                # Get the list of all current winning numbers
-                current_winning_numbers = list(
-                    winningNumber.objects.values_list("num", flat=True)
-                )
-
-                # Query all existing Bingo boards
-                all_boards = BingoBoard.objects.all()
-
-                # Iterate through each board and call validate_board
-                for board in all_boards:
-                    validated_board = board.validate_board(
-                        winning_numbers=current_winning_numbers
-                    )
-                    validated_board.save()  # Save the updated is_winner status
-
-                winning_boards = BingoBoard.objects.all().filter(is_winner=True)
-                print(winning_boards)
-
-            # ------------------------------------
-            # Construct the URL for redirection, including the parameters
-            # Use the URL pattern name that expects these parameters
-            redirect_url = reverse(
-                "bingo:game_master_with_params",  # Use the namespaced URL name
-                kwargs={"period": period, "toggle_state": toggle_state},
-            )
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        if not data.get("draw"):
+            return JsonResponse({"error": "nothing to do"}, status=400)
+
+        expected_seq = data.get("expected_seq")
+        try:
+            result = draws.draw(None if expected_seq is None else int(expected_seq))
+        except draws.OutOfNumbers as e:
+            return JsonResponse({"error": str(e)}, status=500)
+        except ValueError:
+            return JsonResponse({"error": "invalid expected_seq"}, status=400)
+        return JsonResponse(result._asdict())
 
-            # Redirect back to the same page with the received parameters
-            return redirect(redirect_url)
 
+class AutoDrawView(View):
+    """Status and controls of the auto-draw schedule.
+
+    GET returns the schedule; POST takes `{"action": "start" | "pause"}`
+    and/or `{"period": <seconds>}` and returns the updated schedule. Game
+    masters only.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.has_perm("accounts.is_gamemaster"):
+            return JsonResponse({"error": "game master access required"}, status=403)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(scheduler.status())
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON"}, status=400)
-        except Exception as e:
-            print(e)
-            return JsonResponse({"error": str(e)}, status=500)
+        action, period = data.get("action"), data.get("period")
+        try:
+            if action == "start":
+                scheduler.start(period)
+            elif action == "pause":
+                scheduler.pause()
+            elif action is None and period is not None:
+                scheduler.set_period(period)
+            else:
+                return JsonResponse({"error": f"unknown action {action!r}"}, status=400)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse(scheduler.status())
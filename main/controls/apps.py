@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ControlsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'controls'
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in, user_login_failed
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+        from main import db, metrics, middleware
+
+        connection_created.connect(db.apply_sqlite_pragmas)
+        connection_created.connect(middleware.install_query_timer)
+        request_started.connect(db.count_request)
+        user_logged_in.connect(metrics.count_login)
+        user_login_failed.connect(metrics.count_login_failed)
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main import db
+
+
+def connect(path: str, profile: dict) -> sqlite3.Connection:
+    """Opens a connection the way Django and `main.db` apply a profile."""
+    options = profile["options"]
+    conn = sqlite3.connect(
+        path, timeout=options.get("timeout", 5), isolation_level=None
+    )
+    for statement in db.pragma_statements(profile["pragmas"]):
+        conn.execute(statement)
+    return conn
+
+
+def worker(path: str, profile: dict, duration: float, write_ratio: float, seed: int):
+    """Mixed read/write loop resembling draws (writes) and page loads (reads).
+
+    :return: (reads, writes, lock errors)
+    """
+    import random
+
+    rng = random.Random(seed)
+    begin = f"BEGIN {profile['options'].get('transaction_mode', '')}".strip()
+    conn = connect(path, profile)
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                conn.execute(begin)
+                conn.execute("SELECT count(*) FROM draws").fetchone()
+                conn.execute("INSERT INTO draws (num) VALUES (?)", (rng.random(),))
+                conn.execute("COMMIT")
+                writes += 1
+            else:
+                conn.execute(
+                    "SELECT num FROM draws ORDER BY id DESC LIMIT 7"
+                ).fetchall()
+                conn.execute("SELECT count(*) FROM draws").fetchone()
+                reads += 1
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            errors += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+    conn.close()
+    return reads, writes, errors
+
+
+class Command(BaseCommand):
+    help = "benchmark concurrent reads/writes against each SQLITE_PROFILES entry"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-w", "--workers", type=int, default=8)
+        parser.add_argument("-d", "--duration", type=float, default=5.0)
+        parser.add_argument("--write-ratio", type=float, default=0.2)
+        parser.add_argument(
+            "--profiles", nargs="+", default=list(settings.SQLITE_PROFILES)
+        )
+
+    def run_profile(self, profile: dict, opts: dict) -> tuple[int, int, int]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.sqlite3")
+            conn = connect(path, profile)
+            conn.execute("CREATE TABLE draws (id INTEGER PRIMARY KEY, num REAL)")
+            conn.executemany(
+                "INSERT INTO draws (num) VALUES (?)", ((i,) for i in range(1000))
+            )
+            conn.close()
+
+            # separate processes, like gunicorn workers sharing one database file
+            with multiprocessing.Pool(opts["workers"]) as pool:
+                results = pool.starmap(
+                    worker,
+                    [
+                        (path, profile, opts["duration"], opts["write_ratio"], seed)
+                        for seed in range(opts["workers"])
+                    ],
+                )
+        return tuple(map(sum, zip(*results)))
+
+    def handle(self, *args, **opts):
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"workers={opts['workers']} duration={opts['duration']}s "
+                f"write_ratio={opts['write_ratio']}"
+            )
+        )
+        for name in opts["profiles"]:
+            reads, writes, errors = self.run_profile(
+                settings.SQLITE_PROFILES[name], opts
+            )
+            duration = opts["duration"]
+            self.stdout.write(
+                f"{name:>12}: {reads / duration:9.0f} reads/s "
+                f"{writes / duration:8.0f} writes/s {errors:6d} lock errors"
+            )
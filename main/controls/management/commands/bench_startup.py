@@ -0,0 +1,83 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# every stage prints the resident set size of the interpreter once done
+RSS = "print(open('/proc/self/status').read().split('VmRSS:')[1].split()[0])"
+STAGES = {
+    "settings": "import main.settings",
+    "setup": "import django; django.setup()",
+    "urls": "import django; django.setup(); import main.urls",
+}
+IMPORTTIME_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|(\s+)(\S+)")
+
+
+class Command(BaseCommand):
+    help = "measure the wall time and memory of importing settings, django.setup() and the urlconf in a fresh interpreter"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-r", "--repeat", type=int, default=10)
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=0,
+            help="also list the N slowest top-level imports of the urls stage (-X importtime)",
+        )
+
+    def run_stage(self, code: str, *flags: str) -> subprocess.CompletedProcess:
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "main.settings"}
+        return subprocess.run(
+            [sys.executable, *flags, "-c", f"{code}\n{RSS}"],
+            check=True,
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+
+    def time_stage(self, code: str, repeat: int) -> tuple[list[float], int]:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = self.run_stage(code)
+            timings.append(time.perf_counter() - start)
+        rss_kb = int(result.stdout.split()[-1])
+        return timings, rss_kb
+
+    def top_imports(self, code: str, count: int) -> list[tuple[int, str]]:
+        """Cumulative microseconds of the top-level imports, slowest first."""
+        stderr = self.run_stage(code, "-X", "importtime").stderr
+        imports = []
+        for match in IMPORTTIME_RE.finditer(stderr):
+            cumulative, indent, module = match.groups()
+            if len(indent) == 1:
+                imports.append((int(cumulative), module))
+        return sorted(imports, reverse=True)[:count]
+
+    def handle(self, *args, **options):
+        timings, base_rss = self.time_stage("pass", options["repeat"])
+        baseline = statistics.median(timings)
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"repeat={options['repeat']} interpreter={baseline * 1000:.1f}ms "
+                f"rss={base_rss / 1024:.1f}MB"
+            )
+        )
+        for name, code in STAGES.items():
+            timings, rss_kb = self.time_stage(code, options["repeat"])
+            self.stdout.write(
+                f"{name:>10}: median {(statistics.median(timings) - baseline) * 1000:7.1f}ms "
+                f"min {(min(timings) - baseline) * 1000:7.1f}ms "
+                f"rss +{(rss_kb - base_rss) / 1024:5.1f}MB"
+            )
+
+        if options["top"]:
+            self.stdout.write(self.style.MIGRATE_HEADING("slowest top-level imports"))
+            for cumulative, module in self.top_imports(STAGES["urls"], options["top"]):
+                self.stdout.write(f"{cumulative / 1000:8.1f}ms  {module}")
@@ -1,3 +1,115 @@
-from django.test import TestCase
+import os
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Permission
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from accounts.models import CustomUser
+from main import db, metrics, version
+
+
+class ConnectionSetupTest(TestCase):
+    def setUp(self):
+        db.reset_connection_stats()
+
+    @override_settings(SQLITE_PRAGMAS={"cache_size": -1234, "temp_store": "MEMORY"})
+    def test_pragmas_applied_on_new_connection(self):
+        conn = connections.create_connection("default")
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("PRAGMA cache_size")
+                self.assertEqual(cursor.fetchone()[0], -1234)
+                cursor.execute("PRAGMA temp_store")
+                self.assertEqual(cursor.fetchone()[0], 2)
+        finally:
+            conn.close()
+        self.assertEqual(db.connection_stats()["connections_created"], 1)
+
+    def test_reuse_ratio(self):
+        opened = []
+        try:
+            opened.append(connections.create_connection("default"))
+            opened[-1].ensure_connection()
+            for _ in range(4):
+                db.count_request(sender=None)
+            self.assertEqual(db.connection_stats()["reuse_ratio"], 0.75)
+
+            # a new connection, e.g. after CONN_MAX_AGE expired
+            opened.append(connections.create_connection("default"))
+            opened[-1].ensure_connection()
+        finally:
+            for conn in opened:
+                conn.close()
+        stats = db.connection_stats()
+        self.assertEqual(stats["connections_created"], 2)
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(stats["reuse_ratio"], 0.5)
+
+
+class AppVersionTest(SimpleTestCase):
+    def setUp(self):
+        version.get_app_version.cache_clear()
+        self.addCleanup(version.get_app_version.cache_clear)
+
+    @mock.patch.dict("os.environ", {"APP_VERSION": "v1.2.3"})
+    def test_baked_version_wins(self):
+        self.assertEqual(version.get_app_version(), "v1.2.3")
+
+    @mock.patch.dict("os.environ", {"APP_VERSION": ""})
+    def test_missing_file_does_not_run_git(self):
+        with mock.patch.object(
+            version, "VERSION_FILEPATH", version.VERSION_FILEPATH.with_name("nope")
+        ), mock.patch("subprocess.run") as run:
+            self.assertEqual(version.get_app_version(), version.UNKNOWN_VERSION)
+        run.assert_not_called()
+
+
+class MetricsTest(TestCase):
+    url = "/controls/metrics"
+
+    def setUp(self):
+        metrics.clear()
+
+    def test_render_histogram(self):
+        histogram = metrics.Histogram(
+            "test_seconds", "Test.", ("view",), buckets=(1, 5)
+        )
+        self.addCleanup(metrics.REGISTRY.pop, "test_seconds")
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value, view="a")
+        lines = metrics.render({"test_seconds": histogram}).splitlines()
+        self.assertIn("# TYPE test_seconds histogram", lines)
+        bucket = 'test_seconds_bucket{view="a",le="%s",pid="' + str(os.getpid()) + '"}'
+        self.assertIn(bucket % "1.0" + " 2", lines)
+        self.assertIn(bucket % "5.0" + " 3", lines)
+        self.assertIn(bucket % "+Inf" + " 4", lines)
+
+    def test_request_metrics(self):
+        gamemaster = CustomUser.objects.create(username="gm", email="gm@example.com")
+        gamemaster.user_permissions.add(
+            Permission.objects.get(codename="is_gamemaster")
+        )
+        self.client.force_login(gamemaster)
+        self.client.get("/bingo/gmview/autodraw")
+        self.assertEqual(metrics.REQUEST_LATENCY.count(view="bingo:autodraw"), 1)
+        self.assertEqual(
+            metrics.REQUESTS.value(view="bingo:autodraw", method="GET", status=200), 1
+        )
+        self.assertGreater(metrics.REQUEST_DB_QUERIES.total(view="bingo:autodraw"), 0)
+        self.assertEqual(metrics.RESPONSE_SIZE.count(view="bingo:autodraw"), 1)
+
+    def test_failed_login_counted(self):
+        self.client.post("/accounts/login-no-password/", {"username": "nobody"})
+        self.assertEqual(metrics.LOGINS.value(result="failure"), 1)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_endpoint_is_protected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        response = self.client.get(self.url, headers={"Authorization": "Bearer wrong"})
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(self.url, headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("http_request_duration_seconds_bucket", response.text)
+        self.assertIn("db_connection_reuse_ratio", response.text)
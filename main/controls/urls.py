@@ -7,4 +7,5 @@ app_name = "controls"
 urlpatterns = [
     path("", views.HomeView.as_view(), name="home"),
     path("users", views.UserListView.as_view(), name="users_list_view"),
+    path("metrics", views.MetricsView.as_view(), name="metrics"),
 ]
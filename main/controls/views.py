@@ -1,14 +1,19 @@
 # main/controls/views.py
 
+import hmac
 import logging
 
 from accounts import djfilters as accounts_filters
 from accounts import models as accounts_models
 from accounts import tables as accounts_tables
+from django.conf import settings
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.http import HttpResponse
+from django.views import View
 from django.views.generic.base import TemplateView
 from django_filters.views import FilterView
 from django_tables2 import SingleTableMixin
+from main import metrics
 from main.custom_mixin import CustomLoginRequiredMixin
 
 lg = logging.getLogger("django")
@@ -27,3 +32,25 @@ class UserListView(
     model = accounts_models.CustomUser
     table_class = accounts_tables.UsersListTable
     filterset_class = accounts_filters.CustomUsersFilter
+
+
+class MetricsView(View):
+    """Prometheus scrape endpoint, for a bearer `METRICS_TOKEN` or game masters."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def has_access(self, request) -> bool:
+        token = settings.METRICS_TOKEN
+        auth = request.headers.get("Authorization", "")
+        if token and hmac.compare_digest(auth.encode(), f"Bearer {token}".encode()):
+            return True
+        return request.user.has_perm("accounts.is_gamemaster")
+
+    def get(self, request, *args, **kwargs):
+        if not self.has_access(request):
+            response = HttpResponse(
+                "forbidden\n", status=403, content_type="text/plain"
+            )
+            response["WWW-Authenticate"] = "Bearer"
+            return response
+        return HttpResponse(metrics.render(), content_type=self.content_type)
@@ -5,3 +5,4 @@ from employees import models
 # Register your models here.
 
 admin.site.register(models.EmployeeModel)
+admin.site.register(models.ImportManifest)
@@ -1,11 +1,17 @@
+import csv
+import hashlib
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Self
+from typing import Iterator, NamedTuple, Optional, Self
 
 import pandas as pd
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from employees import models
+from main.utils import get_datetime_str
 
 # cwd from Django defaults to /root/main/manage.py
 cwd = Path.cwd().parent
@@ -27,8 +33,21 @@ EMPLOYEE_NAME_COLUMN = "NAME"
 EMPLOYEE_ID_MAX_LENGTH = 8
 
 
+class ImportResult(NamedTuple):
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __add__(self, other: "ImportResult") -> "ImportResult":
+        return ImportResult(*(a + b for a, b in zip(self, other)))
+
+    def __str__(self) -> str:
+        return f"{self.created} created, {self.updated} updated, {self.unchanged} unchanged"
+
+
 class EmployeeDataParser:
-    df: Optional[pd.DataFrame] = None
+    chunksize: int = 2000
+    batch_size: int = 500
 
     def __init__(self, path: Path, cmd: BaseCommand) -> Self:
         self.cmd = cmd
@@ -36,35 +55,193 @@ class EmployeeDataParser:
         if not self.path.is_file():
             raise FileNotFoundError(f"Directory {self.path} does not exist.")
 
-    def parse_csv(self):
-        df = pd.read_csv(self.path)
-        for col_name in [EMPLOYEE_ID_COLUMN, EMPLOYEE_NAME_COLUMN]:
-            if col_name not in df.columns:
-                raise ValueError(f"Required '{col_name=}' not found in the CSV file.")
-        df[EMPLOYEE_ID_COLUMN] = df[EMPLOYEE_ID_COLUMN].apply(
-            lambda x: str(x).zfill(EMPLOYEE_ID_MAX_LENGTH)
-        )
-        df[EMPLOYEE_NAME_COLUMN] = df[EMPLOYEE_NAME_COLUMN].astype(str).str.strip()
-        self.df = df
-
-    def load_to_db(self, debug: bool = False) -> None:
-        if self.df is None:
-            raise ValueError("DataFrame is not initialized. Call parse_csv() first.")
-        for _, row in self.df.iterrows():
-            emp, created = models.EmployeeModel.objects.get_or_create(
-                employee_id=row[EMPLOYEE_ID_COLUMN]
+    def iter_chunks(self) -> Iterator[dict[str, str]]:
+        """Reads the CSV `chunksize` rows at a time.
+
+        :return: per chunk, a dict of employee_id -> name; the last row wins
+            when an employee id is repeated
+        """
+        try:
+            reader = pd.read_csv(
+                self.path,
+                usecols=[EMPLOYEE_ID_COLUMN, EMPLOYEE_NAME_COLUMN],
+                dtype=str,
+                keep_default_na=False,
+                chunksize=self.chunksize,
             )
-            if created:
-                emp.name = row[EMPLOYEE_NAME_COLUMN]
-                emp.save()
-                self.cmd.stdout.write(
-                    self.cmd.style.SUCCESS(f"{emp} saved to database.")
+        except ValueError as e:
+            # raised by usecols when a required column is missing
+            raise ValueError(f"{self.path.name}: {e}") from e
+        with reader:
+            for df in reader:
+                ids = (
+                    df[EMPLOYEE_ID_COLUMN].str.strip().str.zfill(EMPLOYEE_ID_MAX_LENGTH)
+                )
+                names = df[EMPLOYEE_NAME_COLUMN].str.strip()
+                yield dict(zip(ids, names))
+
+    def load_chunk(self, rows: dict[str, str]) -> ImportResult:
+        """Creates missing employees and renames or reactivates changed ones,
+        with one query to find the existing employees of the chunk."""
+        existing = models.EmployeeModel.objects.filter(
+            employee_id__in=rows.keys()
+        ).only("id", "employee_id", "name", "is_active")
+        existing = {emp.employee_id: emp for emp in existing}
+
+        to_create, to_update = [], []
+        for employee_id, name in rows.items():
+            emp = existing.get(employee_id)
+            if emp is None:
+                to_create.append(
+                    models.EmployeeModel(employee_id=employee_id, name=name)
                 )
-            else:
-                if debug:
-                    self.cmd.stdout.write(
-                        f"{emp} already exists in the database, skipping creation."
-                    )
+            elif emp.name != name or not emp.is_active:
+                emp.name = name
+                emp.is_active = True
+                to_update.append(emp)
+        models.EmployeeModel.objects.bulk_create(to_create, batch_size=self.batch_size)
+        models.EmployeeModel.objects.bulk_update(
+            to_update, ["name", "is_active"], batch_size=self.batch_size
+        )
+        return ImportResult(
+            len(to_create), len(to_update), len(rows) - len(to_create) - len(to_update)
+        )
+
+    def load_to_db(self, seen: Optional[set[str]] = None) -> ImportResult:
+        """Imports the whole file in a single transaction.
+
+        :param seen: when given, every employee id of the file is added to it
+        """
+        result = ImportResult()
+        with transaction.atomic():
+            for rows in self.iter_chunks():
+                result += self.load_chunk(rows)
+                if seen is not None:
+                    seen.update(rows)
+        return result
+
+
+def deactivate_missing(seen: set[str], batch_size: int = 500) -> int:
+    """Deactivates active employees whose id is not in `seen`."""
+    active = set(
+        models.EmployeeModel.objects.filter(is_active=True).values_list(
+            "employee_id", flat=True
+        )
+    )
+    vanished = sorted(active - seen)
+    for i in range(0, len(vanished), batch_size):
+        models.EmployeeModel.objects.filter(
+            employee_id__in=vanished[i : i + batch_size]
+        ).update(is_active=False)
+    return len(vanished)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class InputFile(NamedTuple):
+    path: Path
+    sha256: str
+    mtime: float
+    changed: bool
+
+
+def check_manifest(paths: list[Path]) -> list[InputFile]:
+    """Compares the files with their `ImportManifest` entries.
+
+    A file with the recorded mtime is unchanged without being read; otherwise
+    its hash decides, and a touched but identical file only gets its mtime
+    refreshed.
+    """
+    keys = {path: str(path.resolve()) for path in paths}
+    manifests = models.ImportManifest.objects.in_bulk(keys.values(), field_name="path")
+    files = []
+    for path in paths:
+        mtime = path.stat().st_mtime
+        entry = manifests.get(keys[path])
+        if entry is not None and entry.mtime == mtime:
+            files.append(InputFile(path, entry.sha256, mtime, False))
+            continue
+        sha256 = file_sha256(path)
+        if entry is not None and entry.sha256 == sha256:
+            entry.mtime = mtime
+            entry.save(update_fields=["mtime"])
+            files.append(InputFile(path, sha256, mtime, False))
+            continue
+        files.append(InputFile(path, sha256, mtime, True))
+    return files
+
+
+def record_manifest(file: InputFile) -> None:
+    models.ImportManifest.objects.update_or_create(
+        path=str(file.path.resolve()),
+        defaults={"sha256": file.sha256, "mtime": file.mtime},
+    )
+
+
+class EmployeeExporter:
+    """Streams every employee with the claim status of its user account to a
+    CSV or Parquet file, `chunk_size` rows at a time."""
+
+    columns = ("employee_id", "name", "is_active", "has_claimed")
+    chunk_size: int = 2000
+
+    def __init__(self, path: Path) -> Self:
+        self.path = path
+        if self.path.suffix not in (".csv", ".parquet"):
+            raise ValueError(f"unsupported export format {self.path.suffix!r}")
+
+    def iter_batches(self) -> Iterator[list[tuple]]:
+        claimed = UserModel.objects.filter(emp_id_obj=OuterRef("pk"), has_claimed=True)
+        rows = (
+            models.EmployeeModel.objects.order_by("employee_id")
+            .annotate(has_claimed=Exists(claimed))
+            .values_list(*self.columns)
+            .iterator(chunk_size=self.chunk_size)
+        )
+        while batch := list(islice(rows, self.chunk_size)):
+            yield batch
+
+    def to_csv(self) -> int:
+        count = 0
+        with open(self.path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for batch in self.iter_batches():
+                writer.writerows(batch)
+                count += len(batch)
+        return count
+
+    def to_parquet(self) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema(
+            [
+                ("employee_id", pa.string()),
+                ("name", pa.string()),
+                ("is_active", pa.bool_()),
+                ("has_claimed", pa.bool_()),
+            ]
+        )
+        count = 0
+        with pq.ParquetWriter(self.path, schema) as writer:
+            for batch in self.iter_batches():
+                columns = [pa.array(col) for col in zip(*batch)]
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                count += len(batch)
+        return count
+
+    def export(self) -> int:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.suffix == ".parquet":
+            return self.to_parquet()
+        return self.to_csv()
 
 
 class Command(BaseCommand):
@@ -72,55 +249,105 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("-p", "--path")
-        parser.add_argument("--sync", action="store_true")
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="treat the files as the full roster and deactivate employees missing from them",
+        )
         parser.add_argument("-e", "--export", action="store_true")
+        parser.add_argument(
+            "-o",
+            "--output",
+            help="export file, .csv or .parquet (default: app_local_temp/outputs/employees_<datetime>.csv)",
+        )
+        parser.add_argument("--chunksize", type=int)
+        parser.add_argument(
+            "--pattern",
+            default="*.csv",
+            help="glob of the files to import from app_local_temp/inputs",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="import files even when the manifest says they are unchanged",
+        )
 
-    def export(self):
-        if not getattr(self, "dp", None):
-            raise RuntimeError("dataparser is not initialized")
-        self.dp.export()
-
-    def sync(self):
-        self.stdout.write(self.style.MIGRATE_HEADING("running database sync ..."))
-        if not getattr(self, "dp", None):
-            raise RuntimeError("dataparser is not initialized")
-        # self.dp.db_sync()
+    def export(self, output: Optional[str] = None):
+        if output:
+            path = Path(output)
+        else:
+            path = (
+                settings.APP_LOCAL_TEMP_DIR
+                / "outputs"
+                / f"employees_{get_datetime_str()}.csv"
+            )
+        count = EmployeeExporter(path).export()
+        self.stdout.write(self.style.SUCCESS(f"{count} employees exported to {path}"))
 
-    def handle(self, *args, **options):
-        path = options["path"]
+    def find_inputs(self, path: Optional[str], pattern: str) -> list[Path]:
         if path:
             self.stdout.write(
                 self.style.MIGRATE_LABEL(f"custom path specified: {path}")
             )
-        else:
+            return [Path(path)]
+
+        self.stdout.write(
+            self.style.MIGRATE_LABEL(
+                f"default to reading `{pattern}` files from `app_local_temp/inputs` dir"
+            )
+        )
+        fpath_dir = settings.APP_LOCAL_TEMP_DIR / "inputs"
+        if not fpath_dir.is_dir():
             self.stdout.write(
-                self.style.MIGRATE_LABEL(
-                    "default to reading CSV file from `app_local_temp/inputs` dir"
-                )
+                self.style.ERROR(f"directory {fpath_dir} does not exist, creating it")
+            )
+            fpath_dir.mkdir(parents=True, exist_ok=True)
+            raise CommandError(
+                f"no file found in {fpath_dir}, please place a CSV file of employee data there"
+            )
+        fpaths = sorted(p for p in fpath_dir.glob(pattern) if p.is_file())
+        if not fpaths:
+            raise CommandError(
+                f"no file found in {fpath_dir}, please place a CSV file of employee data there"
             )
-            fpath_dir = settings.APP_LOCAL_TEMP_DIR / "inputs"
-            if not fpath_dir.is_dir():
+        return fpaths
+
+    def import_files(self, fpaths: list[Path], options: dict) -> None:
+        files = check_manifest(fpaths)
+        if not options["force"]:
+            for file in files:
+                if not file.changed:
+                    self.stdout.write(f"{file.path.name}: unchanged, skipped")
+            if not any(file.changed for file in files):
+                return
+        if options["sync"]:
+            # the roster is the union of every file, so a sync reads them all
+            self.stdout.write(self.style.MIGRATE_HEADING("running database sync ..."))
+            to_load = files
+        else:
+            to_load = [f for f in files if f.changed or options["force"]]
+
+        seen = set() if options["sync"] else None
+        with transaction.atomic():
+            for file in to_load:
+                edp = EmployeeDataParser(file.path, self)
+                if options["chunksize"]:
+                    edp.chunksize = options["chunksize"]
+                result = edp.load_to_db(seen)
+                record_manifest(file)
+                self.stdout.write(self.style.SUCCESS(f"{file.path.name}: {result}"))
+            if seen is not None:
+                deactivated = deactivate_missing(seen)
                 self.stdout.write(
-                    self.style.ERROR(
-                        f"directory {fpath_dir} does not exist, creating it"
-                    )
+                    self.style.SUCCESS(f"{deactivated} employees deactivated")
                 )
-                fpath_dir.mkdir(parents=True, exist_ok=True)
-                raise CommandError(
-                    f"no file found in {fpath_dir}, please place a CSV file of employee data there"
-                )
-            gen = fpath_dir.glob("*.csv")
-            fpath = next(gen, None)
-            if fpath is None or not fpath.is_file():
-                raise CommandError(
-                    f"no file found in {fpath_dir}, please place a CSV file of employee data there"
-                )
-            edp = EmployeeDataParser(fpath, self)
-            edp.parse_csv()
-            edp.load_to_db()
 
-        if options["export"]:
-            self.export()
+    def handle(self, *args, **options):
+        # `--export` on its own only exports the current employees
+        if options["path"] or options["sync"] or not options["export"]:
+            self.import_files(
+                self.find_inputs(options["path"], options["pattern"]), options
+            )
 
-        if options["sync"]:
-            self.sync()
+        if options["export"]:
+            self.export(options["output"])
@@ -4,9 +4,24 @@ from django.db import models
 class EmployeeModel(models.Model):
     name = models.CharField(max_length=256)
     employee_id = models.CharField(max_length=8, unique=True)
+    # cleared by `import_employees --sync` when the employee leaves the HR file
+    is_active = models.BooleanField(default=True)
 
     def __str__(self):
         shortened_name = self.name
         if len(self.name) > 13:
             return f"{self.employee_id} ({shortened_name[:10]}...)"
         return f"{self.employee_id} ({self.name})"
+
+
+class ImportManifest(models.Model):
+    """Content hash and mtime of every employee file already imported, so
+    `import_employees` can skip files which did not change."""
+
+    path = models.CharField(max_length=1024, unique=True)
+    sha256 = models.CharField(max_length=64)
+    mtime = models.FloatField()
+    imported_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.path} ({self.sha256[:12]})"
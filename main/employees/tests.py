@@ -1,3 +1,107 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import CustomUser
+from employees.models import EmployeeModel, ImportManifest
+
+
+class ImportEmployeesTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def write_csv(self, name: str, rows: list[tuple]) -> Path:
+        path = self.dir / name
+        lines = ["MDM_EMP_ID,NAME,DEPT"] + [f"{i},{n},x" for i, n in rows]
+        path.write_text("\n".join(lines) + "\n")
+        return path
+
+    def run_import(self, path: Path, *args) -> str:
+        out = StringIO()
+        call_command(
+            "import_employees", "-p", str(path), "--chunksize", "2", *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_chunked_import_counts(self):
+        path = self.write_csv("a.csv", [(1, "Ann"), (2, " Bob "), (3, "Cy")])
+        self.assertIn("3 created, 0 updated, 0 unchanged", self.run_import(path))
+        self.assertEqual(EmployeeModel.objects.get(employee_id="00000002").name, "Bob")
+
+        path = self.write_csv("b.csv", [(1, "Ann"), (2, "Bobby"), (4, "Di")])
+        self.assertIn("1 created, 1 updated, 1 unchanged", self.run_import(path))
+        self.assertEqual(
+            EmployeeModel.objects.get(employee_id="00000002").name, "Bobby"
+        )
+        self.assertEqual(EmployeeModel.objects.count(), 4)
+
+    def test_sync_deactivates_and_reactivates(self):
+        self.run_import(self.write_csv("a.csv", [(1, "Ann"), (2, "Bob"), (3, "Cy")]))
+        out = self.run_import(
+            self.write_csv("b.csv", [(1, "Ann"), (3, "Cyd")]), "--sync"
+        )
+        self.assertIn("0 created, 1 updated, 1 unchanged", out)
+        self.assertIn("1 employees deactivated", out)
+        active = EmployeeModel.objects.filter(is_active=True)
+        self.assertEqual(
+            sorted(active.values_list("employee_id", flat=True)),
+            ["00000001", "00000003"],
+        )
+
+        out = self.run_import(self.write_csv("c.csv", [(2, "Bob")]))
+        self.assertIn("0 created, 1 updated, 0 unchanged", out)
+        self.assertTrue(EmployeeModel.objects.get(employee_id="00000002").is_active)
+
+    def test_export_with_claim_status(self):
+        self.run_import(self.write_csv("a.csv", [(1, "Ann"), (2, "Bob"), (3, "Cy")]))
+        CustomUser.objects.create(
+            username="00000002",
+            email="b@example.com",
+            emp_id_obj=EmployeeModel.objects.get(employee_id="00000002"),
+            has_claimed=True,
+        )
+        output = self.dir / "out.csv"
+        call_command(
+            "import_employees", "--export", "-o", str(output), stdout=StringIO()
+        )
+        with open(output, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(
+            [(r["employee_id"], r["has_claimed"]) for r in rows],
+            [("00000001", "False"), ("00000002", "True"), ("00000003", "False")],
+        )
+
+    def test_unchanged_files_are_skipped(self):
+        path = self.write_csv("a.csv", [(1, "Ann"), (2, "Bob")])
+        self.assertIn("2 created", self.run_import(path))
+        self.assertIn("unchanged, skipped", self.run_import(path))
+
+        # touched but identical content is still skipped
+        os.utime(path, (0, 0))
+        self.assertIn("unchanged, skipped", self.run_import(path))
+        self.assertEqual(ImportManifest.objects.get().mtime, 0)
+
+        self.write_csv("a.csv", [(1, "Ann"), (2, "Bobby")])
+        self.assertIn("0 created, 1 updated, 1 unchanged", self.run_import(path))
+        self.assertIn(
+            "0 created, 0 updated, 2 unchanged", self.run_import(path, "--force")
+        )
+
+    def test_imports_every_input_file(self):
+        inputs = self.dir / "inputs"
+        inputs.mkdir()
+        for name, rows in [("a.csv", [(1, "Ann")]), ("b.csv", [(2, "Bob")])]:
+            (inputs / name).write_text(f"MDM_EMP_ID,NAME\n{rows[0][0]},{rows[0][1]}\n")
+        with self.settings(APP_LOCAL_TEMP_DIR=self.dir):
+            call_command("import_employees", stdout=StringIO())
+            out = StringIO()
+            call_command("import_employees", stdout=out)
+        self.assertEqual(EmployeeModel.objects.count(), 2)
+        self.assertEqual(out.getvalue().count("unchanged, skipped"), 2)
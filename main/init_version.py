@@ -1,3 +1,4 @@
+import os
 import subprocess
 
 try:
@@ -8,6 +9,12 @@ except ImportError:
 
 def init_version():
     dvm = DjangoVersionManager()
+    baked_version = os.environ.get("APP_VERSION", "").strip()
+    if baked_version:
+        # set at image build time, see Dockerfile `ARG APP_VERSION`
+        dvm.write_app_version_file(baked_version)
+        print(f"App version initialized from APP_VERSION: {baked_version}")
+        return
     try:
         version = dvm.get_app_version(run_git_tag=True)
         print(f"App version initialized using git method: {version}")
@@ -1,7 +1,6 @@
 from django.db import models
 from django.db.models import JSONField, IntegerField, CharField, BooleanField, DateTimeField
 import random
-import pandas as pd
 import logging as lg 
 from accounts import models as accounts_models
 
@@ -16,4 +16,4 @@ class SubmitAnswerView(LoginRequiredMixinNopassword, TemplateView):
     template_name = "knowledge/playerview.html"
 
     def post(self, request, *args, **kwargs):
-        print(self.request.POST)
+        lg.debug(f"answer submitted: {self.request.POST}")
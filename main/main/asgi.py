@@ -3,6 +3,11 @@ ASGI config for main project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through ASGI is required for the projector's server-sent event
+stream (`bingo.views.DrawEventsView`), e.g.
+
+    gunicorn main.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +17,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+# read by settings.py to turn persistent database connections off
+os.environ.setdefault('DJANGO_SERVER_INTERFACE', 'asgi')
 
 application = get_asgi_application()
@@ -1,13 +1,15 @@
 from django.conf import settings
 
+from main.version import get_app_version
+
 
 def get_sw_version(*args, **kwargs):
-    """function to get version number from settings.py
+    """function to get the version number resolved at build time
 
     :return: version string
     :rtype: str
     """
-    return {"APP_VERSION": settings.WEBAPP_VERSION}
+    return {"APP_VERSION": get_app_version()}
 
 
 def get_company_info(*args, **kwargs) -> dict:
@@ -0,0 +1,65 @@
+# main/main/db.py
+"""Database connection setup and connection reuse statistics.
+
+`apply_sqlite_pragmas` runs on Django's `connection_created` signal, so the
+profile's pragmas are executed once when a connection is opened and not again
+while the connection is reused (see CONN_MAX_AGE). `count_request` counts the
+requests served, which together with the connections opened gives the reuse
+ratio of this worker process.
+"""
+
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+lg = logging.getLogger("django")
+
+_stats_lock = threading.Lock()
+_stats = {"connections_created": 0, "requests": 0}
+
+
+def pragma_statements(pragmas: dict) -> list[str]:
+    return [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs) -> None:
+    if connection.vendor == "sqlite":
+        for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+            connection.connection.execute(statement)
+    with _stats_lock:
+        _stats["connections_created"] += 1
+
+
+def count_request(sender, **kwargs) -> None:
+    with _stats_lock:
+        _stats["requests"] += 1
+        requests = _stats["requests"]
+    every = settings.DB_CONN_STATS_LOG_EVERY
+    if every and requests % every == 0:
+        stats = connection_stats()
+        lg.info(
+            f"db connections pid={os.getpid()}: {stats['connections_created']} "
+            f"opened for {stats['requests']} requests "
+            f"(reuse ratio {stats['reuse_ratio']:.2f})"
+        )
+
+
+def connection_stats() -> dict:
+    """Connections opened and requests served by this process.
+
+    `reuse_ratio` is the share of requests which did not need a new
+    connection; it stays near 0 with CONN_MAX_AGE=0.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    created, requests = stats["connections_created"], stats["requests"]
+    stats["reuse_ratio"] = max(0.0, 1 - created / requests) if requests else 0.0
+    return stats
+
+
+def reset_connection_stats() -> None:
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,212 @@
+# main/main/metrics.py
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Every worker process keeps its own counters and histograms, and the
+`/controls/metrics` endpoint renders those of the worker serving the scrape
+(each sample carries a `pid` label so series of different workers never mix).
+The metrics themselves are declared at the bottom of this module.
+"""
+
+import bisect
+import os
+import threading
+from typing import Callable, Iterable, Optional
+
+from main import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+REGISTRY: dict[str, "Metric"] = {}
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+        for value in labels.values()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY[name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[tuple[str, dict, float]]:
+        raise NotImplementedError
+
+    def render(self, const_labels: dict) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, labels, value in self.samples():
+            labels = {**labels, **const_labels}
+            lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # per-bucket (not cumulative) counts, then count and sum
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            entry[0][index] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[1] if entry else 0
+
+    def total(self, **labels) -> float:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0.0
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(b), n, s) for key, (b, n, s) in self._values.items()}
+        for key, (buckets, count, total) in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, float("inf")), buckets):
+                cumulative += bucket
+                le = {**labels, "le": format_value(float(bound))}
+                yield f"{self.name}_bucket", le, cumulative
+            yield f"{self.name}_count", labels, count
+            yield f"{self.name}_sum", labels, total
+
+
+class GaugeFunc(Metric):
+    """Gauge whose samples are read from `func` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, func: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.func = func
+
+    def samples(self):
+        yield self.name, {}, self.func()
+
+
+def render(registry: Optional[dict] = None) -> str:
+    const_labels = {"pid": os.getpid()}
+    lines = []
+    for metric in (registry or REGISTRY).values():
+        lines.extend(metric.render(const_labels))
+    return "\n".join(lines) + "\n"
+
+
+def clear() -> None:
+    for metric in REGISTRY.values():
+        metric.clear()
+
+
+# request metrics, see `main.middleware.MetricsMiddleware`
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests served per view and status.",
+    ("view", "method", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to produce the response.", ("view",)
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request.",
+    ("view",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in database queries per request.", ("view",)
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of non-streaming response bodies.",
+    ("view",),
+    buckets=SIZE_BUCKETS,
+)
+
+# application counters
+DRAWS = Counter("bingo_draws_total", "Draw requests by outcome.", ("result",))
+DRAW_VALIDATION = Histogram(
+    "bingo_draw_validation_seconds", "Time spent checking boards for winners per draw."
+)
+LOGINS = Counter("accounts_logins_total", "Login attempts by outcome.", ("result",))
+
+
+def count_login(sender, **kwargs) -> None:
+    LOGINS.inc(result="success")
+
+
+def count_login_failed(sender, **kwargs) -> None:
+    LOGINS.inc(result="failure")
+
+
+GaugeFunc(
+    "db_connections_created",
+    "Database connections opened by this worker.",
+    lambda: db.connection_stats()["connections_created"],
+)
+GaugeFunc(
+    "db_connection_reuse_ratio",
+    "Share of requests served on a reused connection.",
+    lambda: db.connection_stats()["reuse_ratio"],
+)
@@ -0,0 +1,88 @@
+# main/main/middleware.py
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from main import metrics
+
+
+class QueryStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+
+# stats of the request being served; context variables follow the request
+# into the threads `sync_to_async` runs its queries in
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def time_queries(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - start
+
+
+def install_query_timer(sender, connection, **kwargs) -> None:
+    """`connection_created` receiver adding `time_queries` to each connection."""
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+class MetricsMiddleware:
+    """Records latency, database queries and response size per view in
+    `main.metrics`. Streaming responses are timed until their headers are
+    ready and have no size."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    @staticmethod
+    def record(request, response, seconds: float, stats: QueryStats) -> None:
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        metrics.REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.REQUEST_LATENCY.observe(seconds, view=view)
+        metrics.REQUEST_DB_QUERIES.observe(stats.count, view=view)
+        metrics.REQUEST_DB_TIME.observe(stats.seconds, view=view)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view=view)
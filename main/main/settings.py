@@ -16,7 +16,7 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
-from main.utils import DjangoVersionManager, convert_str_to_bool
+from main.utils import convert_str_to_bool
 
 lg = logging.getLogger("django")
 load_dotenv()
@@ -28,15 +28,6 @@ APP_LOCAL_TEMP_DIR = BASE_DIR.parent / "app_local_temp"
 APP_LOCAL_TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
 
-dvm = DjangoVersionManager()
-if dvm.version_file_exists():
-    # Fetches the version number from existing APP_VERSION file
-    WEBAPP_VERSION = dvm.get_app_version_from_file()
-else:
-    # Attempts to create the APP_VERSION file from `git tag` command
-    WEBAPP_VERSION = dvm.get_app_version(run_git_tag=True)
-
-
 LOGFILE_FILEPATH = BASE_DIR / APP_LOCAL_TEMP_DIR / "logs" / f"{LOGFILE_NAME}"
 LOGFILE_FILEPATH.parent.mkdir(parents=True, exist_ok=True)
 LOGGING = {
@@ -111,6 +102,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -161,12 +153,62 @@ if USER_SPECIFIED_DB_PATH:
 SQLITE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 
+# SQLite tuning profile, selected with the SQLITE_PROFILE env variable.
+# "production" switches to WAL journaling so readers never block the writer,
+# relaxes fsync to NORMAL (safe with WAL), enlarges the page cache and mmap,
+# waits up to `timeout` seconds on a locked database instead of failing, and
+# takes the write lock at BEGIN so transactions cannot deadlock on upgrade.
+# The pragmas are applied once per new connection by `main.db`.
+SQLITE_PROFILES = {
+    "default": {
+        "options": {},
+        "pragmas": {},
+        "conn_max_age": 0,
+    },
+    "production": {
+        "options": {"timeout": 20, "transaction_mode": "IMMEDIATE"},
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 268435456,
+            "cache_size": -65536,
+            "temp_store": "MEMORY",
+        },
+        "conn_max_age": 600,
+    },
+}
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "default").lower()
+if SQLITE_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(
+        f"unknown SQLITE_PROFILE={SQLITE_PROFILE!r}, expected one of {list(SQLITE_PROFILES)}"
+    )
+SQLITE_PRAGMAS = SQLITE_PROFILES[SQLITE_PROFILE]["pragmas"]
+# set by main/asgi.py; under ASGI sync code runs in changing threads, so a
+# persistent per-thread connection is not reused but left open (Django docs:
+# "disable persistent connections" for ASGI)
+SERVING_ASGI = os.environ.get("DJANGO_SERVER_INTERFACE", "wsgi") == "asgi"
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": SQLITE_DB_PATH,
+        "OPTIONS": SQLITE_PROFILES[SQLITE_PROFILE]["options"],
+        # seconds a worker thread keeps its connection open, 0 closes it after
+        # every request; persistent connections are off by default under ASGI
+        "CONN_MAX_AGE": (
+            int(os.environ["DJANGO_CONN_MAX_AGE"])
+            if os.environ.get("DJANGO_CONN_MAX_AGE", "").isdigit()
+            else 0 if SERVING_ASGI else SQLITE_PROFILES[SQLITE_PROFILE]["conn_max_age"]
+        ),
+        "CONN_HEALTH_CHECKS": convert_str_to_bool(
+            os.environ.get("DJANGO_CONN_HEALTH_CHECKS", "true")
+        ),
     }
 }
+# logs the connection reuse ratio of each worker every n requests, 0 disables
+DB_CONN_STATS_LOG_EVERY = int(os.environ.get("DB_CONN_STATS_LOG_EVERY", "1000"))
+# bearer token for scraping /controls/metrics; game masters can always view it
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
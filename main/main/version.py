@@ -0,0 +1,26 @@
+# main/main/version.py
+"""Application version, resolved once at build time and read lazily.
+
+The version comes from the APP_VERSION env variable, which the Dockerfile
+bakes into the image, or else from `app_version.txt`, which `init_version.py`
+writes from `git tag` when the app is initialised. Nothing here shells out
+to git or touches the filesystem until the version is first requested.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+
+VERSION_FILEPATH = Path(__file__).parent / "app_version.txt"
+UNKNOWN_VERSION = "v0.0.0-error"
+
+
+@lru_cache(maxsize=1)
+def get_app_version() -> str:
+    version = os.environ.get("APP_VERSION", "").strip()
+    if version:
+        return version
+    try:
+        return VERSION_FILEPATH.read_text().strip() or UNKNOWN_VERSION
+    except OSError:
+        return UNKNOWN_VERSION